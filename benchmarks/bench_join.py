@@ -0,0 +1,152 @@
+"""
+Benchmark for joining the data of standard and custom models for the live data view and the custom data export:
+chain of `pd.merge()` calls on columns (as formerly done in `get_dataframe_from_linked_models()`) vs. the joins on
+indexed dataframes in `join_dataframes()`.
+
+The data consists of 5 standard models (session, subsession, group, player, participant) and 3 custom models (two
+linked to the player, one linked to the group). Time and peak memory usage of both approaches are reported. With
+pandas 1.2.5, the index joins are about a third faster while their peak memory usage is about the same as for the
+merge chain (both are dominated by the joined data, which is about 175 MB).
+
+Run this script from the root directory of an oTree project (e.g. this repository) with
+`python benchmarks/bench_join.py`.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.getcwd())
+
+from otreeutils import scripts   # sets up oTree / Django
+
+import numpy as np
+import pandas as pd
+
+from otreeutils.admin_extensions.views import join_dataframes
+
+
+N_SESSIONS = 10
+N_ROUNDS = 10
+N_GROUPS_PER_ROUND = 10
+N_PLAYERS_PER_GROUP = 4
+N_CUSTOM_PER_PLAYER = 5     # rows per player for each of the two custom models linked to the player
+N_CUSTOM_PER_GROUP = 3      # rows per group for the custom model linked to the group
+N_FIELDS = 8                # additional data fields per model
+SEED = 20261017
+
+
+def make_model_dataframe(name, n_rows, links, rng):
+    """
+    Generate a dataframe for model `name` with `n_rows` rows, an ID column, link columns as given by dict `links`
+    (link column -> array of IDs) and `N_FIELDS` data columns.
+    """
+    cols = {'id': np.arange(1, n_rows + 1)}
+    cols.update(links)
+    for i in range(N_FIELDS):
+        cols['field%d' % i] = rng.integers(0, 100, n_rows) if i % 2 == 0 else rng.normal(size=n_rows)
+
+    df = pd.DataFrame(cols)
+    return df.rename(columns={c: name + '.' + c for c in df.columns})
+
+
+def make_models(rng):
+    """
+    Generate the dataframes for all models. Returns a list of tuples `(dataframe, (left key, right key), columns)`
+    where `columns` are the columns that should appear in the joined data.
+    """
+    n_subsess = N_SESSIONS * N_ROUNDS
+    n_groups = n_subsess * N_GROUPS_PER_ROUND
+    n_players = n_groups * N_PLAYERS_PER_GROUP
+    n_participants = n_players // N_ROUNDS
+
+    player_group_ids = np.repeat(np.arange(1, n_groups + 1), N_PLAYERS_PER_GROUP)
+    # participant IDs of the players per round: all participants of a session play in each round of this session
+    player_participant_ids = (np.arange(n_players) % (n_participants // N_SESSIONS)) \
+        + np.repeat(np.arange(N_SESSIONS), n_players // N_SESSIONS) * (n_participants // N_SESSIONS) + 1
+
+    models = [
+        (make_model_dataframe('session', N_SESSIONS, {}, rng), (None, None)),
+        (make_model_dataframe('subsession', n_subsess,
+                              {'session_id': np.repeat(np.arange(1, N_SESSIONS + 1), N_ROUNDS)}, rng),
+         ('session.id', 'subsession.session_id')),
+        (make_model_dataframe('group', n_groups,
+                              {'subsession_id': np.repeat(np.arange(1, n_subsess + 1), N_GROUPS_PER_ROUND)}, rng),
+         ('subsession.id', 'group.subsession_id')),
+        (make_model_dataframe('groupdata', n_groups * N_CUSTOM_PER_GROUP,
+                              {'group_id': np.repeat(np.arange(1, n_groups + 1), N_CUSTOM_PER_GROUP)}, rng),
+         ('group.id', 'groupdata.group_id')),
+        (make_model_dataframe('player', n_players,
+                              {'group_id': player_group_ids, 'participant_id': player_participant_ids}, rng),
+         ('group.id', 'player.group_id')),
+        (make_model_dataframe('offer', n_players * N_CUSTOM_PER_PLAYER,
+                              {'player_id': np.repeat(np.arange(1, n_players + 1), N_CUSTOM_PER_PLAYER)}, rng),
+         ('player.id', 'offer.player_id')),
+        (make_model_dataframe('purchase', n_players * N_CUSTOM_PER_PLAYER,
+                              {'player_id': np.repeat(np.arange(1, n_players + 1), N_CUSTOM_PER_PLAYER)}, rng),
+         ('player.id', 'purchase.player_id')),
+        (make_model_dataframe('participant', n_participants, {}, rng), ('player.participant_id', 'participant.id')),
+    ]
+
+    # link columns that are not shown in the joined data (as in the live data view)
+    hidden_columns = {'subsession.session_id', 'group.subsession_id', 'groupdata.group_id', 'player.group_id',
+                      'offer.player_id', 'purchase.player_id'}
+
+    return [(df, link, [c for c in df.columns if c not in hidden_columns]) for df, link in models]
+
+
+def join_with_merge_chain(models):
+    """Former approach: merge the data frames on columns one after another, then remove the link columns."""
+    df = None
+    for df_model, (link_left, link_right), columns in models:
+        if df is None:
+            df = df_model
+        else:
+            df = pd.merge(df, df_model, how='left', left_on=link_left, right_on=link_right)
+            if link_right not in columns:
+                del df[link_right]
+
+    return df
+
+
+def join_with_index(models):
+    """New approach: index each dataframe by its join key (dropping link columns) and use `join_dataframes()`."""
+    df_base = None
+    joins = []
+    all_columns = []
+    for df_model, (link_left, link_right), columns in models:
+        all_columns.extend(columns)
+        if df_base is None:
+            df_base = df_model
+        else:
+            df_right = df_model[columns]
+            df_right.index = pd.Index(df_model[link_right].to_numpy())
+            joins.append((link_left, df_right))
+
+    return join_dataframes(df_base, joins, all_columns)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    t_start = time.perf_counter()
+    res = fn(*args)
+    t = time.perf_counter() - t_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return res, t, peak / 1024**2
+
+
+if __name__ == '__main__':
+    models = make_models(np.random.default_rng(SEED))
+    print('joining %d models with %s rows' % (len(models), ', '.join(str(len(df)) for df, _, _ in models)))
+
+    res_chain, t_chain, mem_chain = measure(join_with_merge_chain, models)
+    res_index, t_index, mem_index = measure(join_with_index, models)
+
+    assert res_chain.equals(res_index), 'results differ'
+
+    print('joined data: %d rows and %d columns' % res_index.shape)
+    print('merge chain: %.2fs, peak memory %.1f MB' % (t_chain, mem_chain))
+    print('index joins: %.2fs, peak memory %.1f MB' % (t_index, mem_index))
@@ -0,0 +1,85 @@
+"""
+Benchmark for sanitizing dataframe values for the live data view and the CSV export: per-cell
+`DataFrame.applymap()` vs. per-column converters in `sanitize_dataframe_for_live_update()` and
+`sanitize_dataframe_for_csv()`.
+
+Run this script from the root directory of an oTree project (e.g. this repository) with
+`python benchmarks/bench_sanitize.py`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from otreeutils import scripts   # sets up oTree / Django
+
+import numpy as np
+import pandas as pd
+from otree.api import Currency
+
+from otreeutils.admin_extensions.views import sanitize_pdvalue_for_live_update, sanitize_pdvalue_for_csv, \
+    sanitize_dataframe_for_live_update, sanitize_dataframe_for_csv
+
+
+N_ROWS = 100000
+SEED = 20261017
+
+
+def make_dataframe(n_rows, rng):
+    """
+    Generate a dataframe with 80 columns of data types that typically occur in the joined data of oTree apps with
+    custom models.
+    """
+    cols = {}
+
+    def add_columns(prefix, n_cols, make_column):
+        for i in range(n_cols):
+            cols['%s%d' % (prefix, i)] = make_column()
+
+    def int_with_na():   # int columns of custom models that are not matched in left joins become float columns
+        x = rng.integers(0, 50, n_rows).astype(float)
+        x[rng.random(n_rows) < 0.2] = np.nan
+        return x
+
+    def bool_with_na():
+        x = pd.Series(rng.random(n_rows) < 0.5, dtype=object)
+        x[rng.random(n_rows) < 0.2] = np.nan
+        return x
+
+    add_columns('int', 30, lambda: rng.integers(0, 10**6, n_rows))
+    add_columns('int_na', 8, int_with_na)
+    add_columns('float', 7, lambda: rng.normal(size=n_rows))
+    add_columns('currency', 10, lambda: pd.Series([Currency(x) for x in rng.integers(0, 500, n_rows) / 100],
+                                                  dtype=object))
+    add_columns('str', 10, lambda: pd.Series(rng.choice(['Apple', 'Orange', 'Banana', 'buyer', 'seller', None],
+                                                        n_rows), dtype=object))
+    add_columns('bool', 10, lambda: rng.random(n_rows) < 0.5)
+    add_columns('bool_na', 4, bool_with_na)
+    add_columns('time', 1, lambda: pd.Series(pd.to_datetime(rng.integers(1600000000, 1600001000, n_rows),
+                                                            unit='s', utc=True)))
+
+    return pd.DataFrame(cols)
+
+
+def timed(fn, *args):
+    t_start = time.perf_counter()
+    res = fn(*args)
+    return res, time.perf_counter() - t_start
+
+
+if __name__ == '__main__':
+    df = make_dataframe(N_ROWS, np.random.default_rng(SEED))
+    print('dataframe with %d rows and %d columns' % df.shape)
+
+    for label, sanitize_value, sanitize_df in (('live update', sanitize_pdvalue_for_live_update,
+                                                sanitize_dataframe_for_live_update),
+                                               ('CSV', sanitize_pdvalue_for_csv, sanitize_dataframe_for_csv)):
+        res_applymap, t_applymap = timed(df.applymap, sanitize_value)
+        res_vectorized, t_vectorized = timed(sanitize_df, df)
+
+        assert res_applymap.equals(res_vectorized), 'results differ'
+
+        print('%s: applymap %.2fs, per-column converters %.2fs, speedup %.1fx'
+              % (label, t_applymap, t_vectorized, t_applymap / t_vectorized))
@@ -19,14 +19,14 @@ apps = ['otreeutils_example1',
         'otreeutils_example2',
         'otreeutils_example3_market']
 
-print('loading data...')
+print('loading and writing data to file', output_file)
 
 # get the data as hierarchical data structure. this is esp. useful if you use
-# custom data models
-combined = scripts.get_hierarchical_data_for_apps(apps)
+# custom data models. the data is fetched session by session and each session
+# is written to the file immediately, which keeps memory usage low for large
+# databases
+sessions = scripts.iter_hierarchical_data_for_apps(apps)
 
-print('writing data to file', output_file)
-
-scripts.save_data_as_json_file(combined, output_file, indent=2)
+scripts.save_data_as_json_stream(sessions, output_file, indent=2)
 
 print('done.')
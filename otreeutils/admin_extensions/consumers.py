@@ -0,0 +1,85 @@
+"""
+WebSocket consumers for pushing updates to the session data monitor.
+
+The consumers are routed via `otreeutils.otree_extensions.routing` when "otreeutils" is listed in `EXTENSION_APPS`.
+"""
+
+from channels.db import database_sync_to_async
+from otree.channels.consumers import _OTreeAsyncJsonWebsocketConsumer, UNRESTRICTED_IN_DEMO_MODE
+from otree.models.session import Session
+
+from . import signals
+from .views import get_data_tab_update, _DATA_TAB_PAGE_SIZE, _DATA_TAB_MAX_PAGE_SIZE
+
+
+class SessionDataConsumer(_OTreeAsyncJsonWebsocketConsumer):
+    """
+    Push updates of the table that is currently shown in the session data monitor.
+
+    The client subscribes to a table by sending `{"app": <app name>, "round": <round number>, "hash": <hash of the
+    rows it has>}` and optionally `"format": "compact"` for the compact encoding of rows (see `encode_rows_compact()`),
+    `"expand": true` for showing all rows of custom models and `"offset"` and `"limit"` for the page of rows. When the
+    data of this table is modified (see `signals` module), the client receives `{"app": ..., "round": ...,
+    "base_hash": ..., "update": ...}` with an update as in `get_data_tab_update()`, i.e. only with the new or changed
+    rows compared to the rows with hash `base_hash`.
+    """
+
+    unrestricted_when = UNRESTRICTED_IN_DEMO_MODE
+
+    def group_name(self, code):
+        return signals.session_data_group_name(code)
+
+    async def post_connect(self, code):
+        self.table = None        # subscribed table as tuple (app name, round number)
+        self.table_hash = ''     # hash of the rows the client has for this table
+        self.options = {}        # options for `get_data_tab_update()`
+        self.subscribed = True
+        signals.add_session_data_subscriber(code)
+
+    async def pre_disconnect(self, code):
+        if getattr(self, 'subscribed', False):
+            signals.remove_session_data_subscriber(code)
+            self.subscribed = False
+
+    async def post_receive_json(self, content, code):
+        try:
+            self.table = (content['app'], int(content['round']))
+        except (KeyError, TypeError, ValueError):
+            return
+        try:
+            offset = max(0, int(content.get('offset', 0)))
+            limit = min(_DATA_TAB_MAX_PAGE_SIZE, max(1, int(content.get('limit', _DATA_TAB_PAGE_SIZE))))
+        except (TypeError, ValueError):
+            return
+
+        self.table_hash = content.get('hash') or ''
+        self.options = dict(compact=content.get('format') == 'compact',
+                            expand_custom_models=bool(content.get('expand')),
+                            offset=offset, limit=limit)
+
+        # push modifications that happened before subscribing
+        await self.push_table_update(code)
+
+    async def session_data_modified(self, event):
+        if self.table is not None and list(self.table) in event['tables']:
+            await self.push_table_update(self.cleaned_kwargs['code'])
+
+    async def push_table_update(self, code):
+        app_name, round_number = self.table
+        base_hash = self.table_hash
+        update = await database_sync_to_async(self.get_table_update)(code, app_name, round_number, base_hash,
+                                                                     self.options)
+
+        # the subscription may have changed in the meantime
+        if update is not None and self.table == (app_name, round_number) and self.table_hash == base_hash:
+            self.table_hash = update['hash']
+            await self.send_json({'app': app_name, 'round': round_number, 'base_hash': base_hash, 'update': update})
+
+    def get_table_update(self, code, app_name, round_number, table_hash, options):
+        session = Session.objects.filter(code=code).first()
+        if session is None or app_name not in session.config['app_sequence']:
+            return None
+
+        tables = get_data_tab_update(session, [table_hash], app_name=app_name, round_number=round_number,
+                                     **options)['tables']
+        return tables[0] if tables else None
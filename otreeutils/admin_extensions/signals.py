@@ -0,0 +1,200 @@
+"""
+Model signal handlers for tracking data modifications, e.g. for detecting if the data shown in the session data
+monitor was changed and for pushing these changes to connected session data monitors.
+"""
+
+import random
+import threading
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+
+# seconds during which modifications are collected before they're pushed to connected session data monitors
+PUSH_COALESCE_SECONDS = 0.5
+
+# number of connected session data monitors per session code (see `consumers.SessionDataConsumer`); the push
+# mechanism works within a single server process, as with oTree's default in-memory channel layer
+_session_data_subscribers = Counter()
+
+# modified tables waiting to be pushed: session ID -> set of tuples (app name, round number)
+_pending_tables = defaultdict(set)
+_pending_lock = threading.Lock()
+
+# cached link field name for the live data view per model class (None if model is not shown in the data view)
+_data_view_links = {}
+
+
+def _count_modification(sender, instance, **kwargs):
+    """
+    Signal handler that increments the modification counter for the session of `instance` (players, groups and
+    subsessions) or for model `sender` (custom models shown in the data view). Other models, including participants
+    that are saved on each page view, are ignored. If a session data monitor is connected, the modified table is marked
+    for pushing when the transaction is committed.
+    """
+    session_id = getattr(instance, 'session_id', None)
+    if session_id is not None and hasattr(instance, 'round_number'):
+        _increment_counter(_session_counter_key(session_id))
+    elif _get_data_view_link(sender) is not None:
+        _increment_counter(_model_counter_key(sender))
+    else:
+        return
+
+    if _session_data_subscribers:
+        transaction.on_commit(partial(_mark_table_modified, instance))
+
+
+def get_session_modification_counter(session_id):
+    """
+    Modification counter of the players, groups and subsessions of the session with ID `session_id`. Its value changes
+    whenever one of these objects is saved or deleted.
+    """
+    return get_modification_counters([_session_counter_key(session_id)])[0]
+
+
+def get_model_modification_counters(models):
+    """Modification counters of custom models `models` (a sequence of model classes) as list."""
+    return get_modification_counters([_model_counter_key(m) for m in models])
+
+
+def get_modification_counters(keys):
+    """
+    Get the modification counters with cache keys `keys` as list. The counters are stored in the shared cache of the
+    session data monitor (see `views.get_data_tab_cache()`), so that modifications are detected across server
+    processes if a cache that all processes share is configured. A counter that doesn't exist (yet or anymore, because
+    it was evicted) is initialized with a random value, so that a re-initialized counter doesn't repeat an old value.
+    """
+    from .views import get_data_tab_cache
+
+    cache = get_data_tab_cache()
+    counters = cache.get_many(keys)
+    for k in keys:
+        if k not in counters:
+            cache.add(k, _initial_counter_value(), None)
+            counters[k] = cache.get(k)
+
+    return [counters[k] for k in keys]
+
+
+def _increment_counter(key):
+    """Increment the modification counter with cache key `key` in the shared cache."""
+    from .views import get_data_tab_cache
+
+    cache = get_data_tab_cache()
+    try:
+        cache.incr(key)
+    except ValueError:   # counter doesn't exist -> initialize it; a new random value is a modification, too
+        if not cache.add(key, _initial_counter_value(), None):
+            cache.incr(key)   # added by another process in the meantime
+
+
+def _initial_counter_value():
+    return random.getrandbits(62)
+
+
+def _session_counter_key(session_id):
+    return 'otreeutils.modifications.session.%d' % session_id
+
+
+def _model_counter_key(model):
+    return 'otreeutils.modifications.model.%s.%s' % (model._meta.app_label, model.__name__)
+
+
+def add_session_data_subscriber(session_code):
+    """Register a connected session data monitor for the session with code `session_code`."""
+    _session_data_subscribers[session_code] += 1
+
+
+def remove_session_data_subscriber(session_code):
+    """Unregister a connected session data monitor for the session with code `session_code`."""
+    _session_data_subscribers[session_code] -= 1
+    if _session_data_subscribers[session_code] <= 0:
+        del _session_data_subscribers[session_code]
+
+
+def get_table_for_object(instance):
+    """
+    Determine the table of the session data monitor that shows the data of model instance `instance`, i.e. a player,
+    group, subsession or an instance of a custom model that is (directly or via other custom models) linked to one of
+    these for the data view.
+
+    Returns a tuple (session ID, app name, round number) or None if the object is not shown in the data view.
+    """
+    visited = set()
+    while not hasattr(instance, 'round_number'):   # follow the links of custom models
+        model = type(instance)
+        link_with = _get_data_view_link(model)
+        if link_with is None or model in visited:
+            return None
+        visited.add(model)
+        try:
+            instance = getattr(instance, link_with)
+        except ObjectDoesNotExist:   # linked object was deleted
+            return None
+
+    session_id = getattr(instance, 'session_id', None)
+    if session_id is None:
+        return None
+
+    return session_id, instance._meta.app_config.name, instance.round_number
+
+
+def _get_data_view_link(model):
+    """Get the link field name of custom model `model` for the data view or None."""
+    try:
+        return _data_view_links[model]
+    except KeyError:
+        conf = getattr(getattr(model, 'CustomModelConf', None), 'data_view', None)
+        link_with = conf.get('link_with') if conf else None
+        _data_view_links[model] = link_with
+        return link_with
+
+
+def _mark_table_modified(instance):
+    """
+    Mark the table of the session data monitor that shows `instance` as modified. The first modification starts a
+    timer that pushes all modifications collected during `PUSH_COALESCE_SECONDS`.
+    """
+    table = get_table_for_object(instance)
+    if table is None:
+        return
+
+    session_id, app_name, round_number = table
+    with _pending_lock:
+        start_timer = not _pending_tables
+        _pending_tables[session_id].add((app_name, round_number))
+
+    if start_timer:
+        timer = threading.Timer(PUSH_COALESCE_SECONDS, _push_modified_tables)
+        timer.daemon = True
+        timer.start()
+
+
+def _push_modified_tables():
+    """Notify the session data monitors of all sessions with modified tables."""
+    from otree.channels.utils import sync_group_send_wrapper
+    from otree.models.session import Session
+
+    with _pending_lock:
+        pending = dict(_pending_tables)
+        _pending_tables.clear()
+
+    try:
+        for session_id, session_code in Session.objects.filter(id__in=pending.keys()).values_list('id', 'code'):
+            if session_code in _session_data_subscribers:
+                sync_group_send_wrapper(type='session_data_modified', group=session_data_group_name(session_code),
+                                        event={'tables': [list(t) for t in sorted(pending[session_id])]})
+    finally:
+        connection.close()   # this thread's database connection
+
+
+def session_data_group_name(session_code):
+    """Name of the channel layer group for the session data monitors of the session with code `session_code`."""
+    return 'otreeutils-session-data-%s' % session_code
+
+
+post_save.connect(_count_modification, dispatch_uid='otreeutils_count_modification_save')
+post_delete.connect(_count_modification, dispatch_uid='otreeutils_count_modification_delete')
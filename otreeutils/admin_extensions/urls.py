@@ -4,8 +4,10 @@ Custom URLs that add hooks to session data monitor extensions.
 Feb. 2021, Markus Konrad <markus.konrad@wzb.eu>
 """
 
+from django.conf import settings
 from django.conf.urls import url
-from otree.urls import urlpatterns
+from django.contrib.auth.decorators import login_required
+from otree.urls import urlpatterns, ALWAYS_UNRESTRICTED, UNRESTRICTED_IN_DEMO_MODE
 
 from . import views
 
@@ -14,11 +16,34 @@ from . import views
 patterns_conf = {
     'SessionData': (r"^SessionData/(?P<code>[a-z0-9]+)/$", views.SessionDataExtension),
     'SessionDataAjax': (r"^session_data/(?P<code>[a-z0-9]+)/$", views.SessionDataAjaxExtension),
+    'SessionDataAggregates': (r"^SessionDataAggregates/(?P<code>[a-z0-9]+)/$", views.SessionDataAggregates),
 }
 
+# views that are accessible without login in demo mode in addition to oTree's views
+unrestricted_in_demo_mode = UNRESTRICTED_IN_DEMO_MODE.union({'SessionDataAggregates'})
+
+
+def as_view_with_auth(name, viewclass):
+    """
+    Create the view function for view class `viewclass` with URL name `name`. As for oTree's own views, a login is
+    required depending on the `AUTH_LEVEL` setting.
+    """
+    unrestricted = {
+        'STUDY': name in ALWAYS_UNRESTRICTED,
+        'DEMO': name in unrestricted_in_demo_mode,
+        '': True,
+        None: True,
+    }.get(settings.AUTH_LEVEL, False)
+
+    if unrestricted:
+        return viewclass.as_view()
+    else:
+        return login_required(viewclass.as_view())
+
+
 # exclude oTree's original patterns with the same names
 urlpatterns = [pttrn for pttrn in urlpatterns if pttrn.name not in patterns_conf.keys()]
 
 # add the patterns
 for name, (pttrn, viewclass) in patterns_conf.items():
-    urlpatterns.append(url(pttrn, viewclass.as_view(), name=name))
+    urlpatterns.append(url(pttrn, as_view_with_auth(name, viewclass), name=name))
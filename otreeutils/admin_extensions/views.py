@@ -6,18 +6,44 @@ Override existing oTree admin views for custom data live view and custom data ex
 Feb. 2021, Markus Konrad <markus.konrad@wzb.eu>
 """
 
+import hashlib
 import json
+import multiprocessing
+import os
+import pickle
+import threading
+import time
 from collections import OrderedDict, defaultdict
-
-from django.http import JsonResponse
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
+from otree.views.abstract import AdminSessionPageMixin
 from otree.views.admin import SessionData, SessionDataAjax
 from otree import export
-from otree.common import get_models_module
+from otree.common import get_models_module, get_app_label_from_import_path
 from otree.db.models import Model
 from otree.models.participant import Participant
+from otree.models.group import BaseGroup
+from otree.models.player import BasePlayer
+from otree.models.subsession import BaseSubsession
 from otree.models.session import Session
+import numpy as np
+import vanilla
+from . import signals
+
 import pandas as pd
 pd.set_option('display.max_columns', 100)
 pd.set_option('display.width', 180)
@@ -26,16 +52,156 @@ pd.set_option('display.width', 180)
 #%% helper functions
 
 
-def _rows_per_key_from_queryset(qs, key):
-    """Make a dict with `row[key] -> [rows with same key]` mapping (rows is a list)."""
+# fields of the Player model that are needed for determining the players' roles (see `get_player_roles()`)
+_PLAYER_ROLE_FIELDS = ('id', 'subsession_id', 'id_in_group', '_role')
+
+# timeout in seconds for caching the known versions of the tables in the session data monitor
+_DATA_TAB_CACHE_TIMEOUT = 600
+
+# aggregate functions that can be used in `data_view['aggregates']` of a `CustomModelConf`
+_AGGREGATE_FUNCTIONS = {
+    'count': Count,
+    'sum': Sum,
+    'avg': Avg,
+    'min': Min,
+    'max': Max,
+}
+
+# default and maximum number of rows per page of a table in the session data monitor
+_DATA_TAB_PAGE_SIZE = 500
+_DATA_TAB_MAX_PAGE_SIZE = 2000
+
+# timeout in seconds for sharing the computed rows of a table in the session data monitor between viewers
+_DATA_TAB_ROWS_TIMEOUT = 10
+
+# seconds after which a viewer stops waiting for another viewer to compute the rows of a table and computes them itself
+_DATA_TAB_LOCK_WAIT = 3
+
+# timeout in seconds of the lock for computing the rows of a table (in case the computing viewer fails to release it)
+_DATA_TAB_LOCK_TIMEOUT = 30
+
+# name of the cache in the `CACHES` setting that is used for the session data monitor if it is configured
+_DATA_TAB_CACHE_ALIAS = 'otreeutils'
+
+# local-memory cache for the session data monitor that is used if no cache `_DATA_TAB_CACHE_ALIAS` is configured
+_data_tab_locmem_cache = None
+
+# limits of the local-memory cache for the session data monitor: maximum number of entries and maximum total size of
+# the (pickled) entries in bytes
+_DATA_TAB_LOCMEM_MAX_ENTRIES = 200
+_DATA_TAB_LOCMEM_MAX_SIZE = 64 * 1024 * 1024
+
+# data types for columnar data export per Django field type
+_COLUMNAR_DTYPES_FOR_FIELD_TYPES = {
+    'AutoField': 'Int64',
+    'BigAutoField': 'Int64',
+    'IntegerField': 'Int64',
+    'BigIntegerField': 'Int64',
+    'SmallIntegerField': 'Int64',
+    'PositiveIntegerField': 'Int64',
+    'PositiveSmallIntegerField': 'Int64',
+    'ForeignKey': 'Int64',
+    'OneToOneField': 'Int64',
+    'BooleanField': 'boolean',
+    'NullBooleanField': 'boolean',
+    'DecimalField': 'float64',
+    'FloatField': 'float64',
+}
+
+
+def _rows_per_key_from_queryset(qs, key, chunk_size=None, fields=()):
+    """
+    Make a dict with `row[key] -> [rows with same key]` mapping (rows is a list). Only the database fields `fields`
+    are fetched (all fields if `fields` is empty). If `chunk_size` is given, the rows are fetched in chunks of this size
+    (using a server-side cursor if the database supports it) instead of fetching and caching the whole result at once.
+    """
     res = defaultdict(list)
 
-    for row in qs.values():
+    rows = qs.values(*fields)
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+
+    for row in rows:
         res[row[key]].append(row)
 
     return res
 
 
+def get_session_ids_for_export(Subsession, session_ids=None, session_codes=None, session_labels=None,
+                               started_after=None, started_before=None, exclude_demo=False):
+    """
+    Return the set of IDs of the sessions that contain data for the app with the subsession model `Subsession` and
+    that match all of the given filter criteria:
+
+    - `session_ids`: sequence of session IDs
+    - `session_codes`: sequence of session codes
+    - `session_labels`: sequence of session labels
+    - `started_after`, `started_before`: datetime limits for the time at which the first participant in a session
+      started (oTree sessions don't record a creation time); `started_before` is exclusive
+    - `exclude_demo`: if True, exclude demo sessions
+
+    All filters are applied in a single database query.
+    """
+
+    qs = Subsession.objects.all()
+
+    if session_ids is not None:
+        qs = qs.filter(session_id__in=session_ids)
+    if session_codes is not None:
+        qs = qs.filter(session__code__in=session_codes)
+    if session_labels is not None:
+        qs = qs.filter(session__label__in=session_labels)
+    if exclude_demo:
+        qs = qs.filter(session__is_demo=False)
+
+    if started_after is not None or started_before is not None:
+        # use a subquery that determines the start time of the first participant in each session
+        qs_started = Participant.objects.values('session_id').annotate(first_start=Min('time_started'))
+        if started_after is not None:
+            qs_started = qs_started.filter(first_start__gte=started_after)
+        if started_before is not None:
+            qs_started = qs_started.filter(first_start__lt=started_before)
+        qs = qs.filter(session_id__in=qs_started.values('session_id'))
+
+    return set(qs.values_list('session_id', flat=True).distinct())
+
+
+def _get_model_field_or_none(model, field_name):
+    """
+    Get field `field_name` (field name or attribute name) of model `model`. Also checks for "private" fields with a
+    leading underscore like `Player._payoff`. Returns None if no such field exists.
+    """
+    for name in (field_name, '_' + field_name):
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            pass
+
+    return None
+
+
+def _db_field_names(model, columns):
+    """
+    Map export column names `columns` of model `model` to the names of the respective database fields (attribute
+    names) as used in `QuerySet.values()`. This handles Player's "payoff" and "role" which are properties for the
+    fields `_payoff` and `_role`.
+    """
+    return [_get_model_field_or_none(model, c).attname for c in columns]
+
+
+def _fields_for_values(model, columns, key_fields=()):
+    """
+    Get the database fields (attribute names) of model `model` that must be fetched for export columns `columns`
+    and the ID fields `key_fields` that are used for linking the data, without duplicates.
+    """
+    fields = []
+    for f in _db_field_names(model, columns) + list(key_fields):
+        if f not in fields:
+            fields.append(f)
+
+    return fields
+
+
 def _set_of_ids_from_rows_per_key(rows, idfield):
     return set(x[idfield] for r in rows.values() for x in r)
 
@@ -45,6 +211,17 @@ def _odict_from_row(row, columns, is_obj=False):
     return OrderedDict((c, export.sanitize_for_csv(getattr(row, c) if is_obj else row[c])) for c in columns)
 
 
+def _select_participant_vars(pvars, keys):
+    """
+    Select the participant variables `pvars` according to `keys`: all variables if `keys` is True, otherwise only the
+    variables with the given keys (in that order).
+    """
+    if keys is True:
+        return pvars
+    else:
+        return OrderedDict((k, pvars[k]) for k in keys if k in pvars)
+
+
 def flatten_list(l):
     f = []
     for items in l:
@@ -77,13 +254,165 @@ def sanitize_pdvalue_for_csv(x):
         return x_
 
 
+def sanitize_dataframe_for_live_update(df):
+    """
+    Sanitize all values in dataframe `df` for the live data view. Gives the same result as
+    `df.applymap(sanitize_pdvalue_for_live_update)`, but much faster.
+    """
+    return _sanitize_dataframe(df, sanitize_pdvalue_for_live_update)
+
+
+def sanitize_dataframe_for_csv(df):
+    """
+    Sanitize all values in dataframe `df` for CSV export. Gives the same result as
+    `df.applymap(sanitize_pdvalue_for_csv)`, but much faster.
+    """
+    return _sanitize_dataframe(df, sanitize_pdvalue_for_csv)
+
+
+def _sanitize_dataframe(df, sanitize_value):
+    """
+    Sanitize all values in dataframe `df` using the function `sanitize_value` for single values. For each column, a
+    converter is chosen once depending on the column's data type so that `sanitize_value` only needs to be called
+    for few values.
+    """
+    sanitized = np.empty(df.shape, dtype=object)
+    for i in range(len(df.columns)):
+        sanitized[:, i] = _sanitize_series(df.iloc[:, i], sanitize_value)
+
+    return pd.DataFrame(sanitized, index=df.index, columns=df.columns)
+
+
+def _sanitize_series(s, sanitize_value):
+    """
+    Sanitize all values in series `s` using the function `sanitize_value` for single values. Returns a NumPy object
+    array of strings.
+    """
+    kind = s.dtype.kind if isinstance(s.dtype, np.dtype) else None   # None for pandas extension types
+
+    if kind == 'b':
+        return np.where(s.to_numpy(), sanitize_value(True), sanitize_value(False)).astype(object)
+    elif kind in ('i', 'u'):
+        return np.array([str(x) for x in s.tolist()], dtype=object)
+    elif kind == 'f':
+        # pandas transforms int columns with NA values to float columns, so integral values are formatted as
+        # integers; the limit for the absolute value is where Python starts to format floats in scientific notation
+        values = s.to_numpy(dtype=np.float64)
+        na = np.isnan(values)
+        integral = ~na & np.isfinite(values) & (np.floor(values) == values) & (np.abs(values) < 1e16)
+        other = ~na & ~integral
+
+        sanitized = np.full(len(values), '', dtype=object)
+        sanitized[integral] = [str(x) for x in values[integral].astype(np.int64).tolist()]
+        sanitized[integral & (values == 0) & np.signbit(values)] = '-0'   # not covered by the int conversion
+        sanitized[other] = [str(x) for x in values[other].tolist()]
+        return sanitized
+    else:
+        # sanitize each distinct value only once
+        try:
+            codes, uniques = pd.factorize(s)
+        except TypeError:   # unhashable values
+            return s.map(sanitize_value).to_numpy(dtype=object)
+
+        # NA values get code -1, which refers to the last element
+        converted = np.array([sanitize_value(x) for x in uniques] + [''], dtype=object)
+        return converted[codes]
+
+
+#%% export plans
+
+
+# cached export plans per (app name, action)
+_export_plans = {}
+
+
+class ExportPlan:
+    """
+    Export configuration of app `app_name` for action `for_action` (`data_view` or `export_data`), i.e. the custom
+    models configuration, the column names of standard and custom models and the links between these models. Use
+    `get_export_plan()` to get a cached instance instead of creating it each time.
+    """
+
+    def __init__(self, app_name, for_action):
+        assert for_action in ('data_view', 'export_data')
+
+        self.app_name = app_name
+        self.for_action = for_action
+
+        # standard models
+        self.models_module = get_models_module(app_name)
+        self.Player = self.models_module.Player
+        self.Group = self.models_module.Group
+        self.Subsession = self.models_module.Subsession
+
+        # columns of the standard models for the data export and for the live data view
+        self.std_models_colnames = {m.__name__.lower(): export.get_fields_for_csv(m)
+                                    for m in (Session, self.Subsession, self.Group, self.Player, Participant)}
+        self.data_tab_colnames = dict(zip(('player', 'group', 'subsession'),
+                                          export.get_fields_for_data_tab(app_name)))
+
+        # custom models configuration, columns and links to other models
+        self.custom_models_conf = get_custom_models_conf(self.models_module, for_action=for_action)
+        self.custom_models_colnames = get_custom_models_columns(self.custom_models_conf, for_action=for_action)
+        self.links_to_custom_models = get_links_between_std_and_custom_models(self.custom_models_conf,
+                                                                               for_action=for_action)
+
+        self.std_models_select_related = defaultdict(list)
+        for smodel_class, cmodels_links in self.links_to_custom_models.items():
+            smodel_lwr = smodel_class.__name__.lower()
+            for cmodel_class, _ in cmodels_links:
+                self.std_models_select_related[smodel_lwr].append(cmodel_class.__name__.lower())
+
+        # columns of the custom models in the live data view, each with the number of rows per row of the linked
+        # standard model
+        self.data_tab_custom_models_colnames = {m: ['_count'] + cols for m, cols in self.custom_models_colnames.items()}
+
+        # all columns displayed in the live data view in their order; without the "_count" columns for the first
+        # version of the data protocol
+        self.data_tab_columns = combine_column_names(self.data_tab_colnames, self.data_tab_custom_models_colnames)
+        self.data_tab_columns_without_counts = combine_column_names(self.data_tab_colnames,
+                                                                    self.custom_models_colnames)
+
+
+def get_export_plan(app_name, for_action):
+    """
+    Get the export plan for app `app_name` and action `for_action` (`data_view` or `export_data`). The plan is
+    created once and then cached for the lifetime of the process. Use `clear_export_plans()` to remove the cached
+    plans, e.g. in tests that change the models configuration.
+
+    The column name lists of the plan are shared between all callers and must not be modified.
+    """
+    key = (app_name, for_action)
+    plan = _export_plans.get(key)
+    if plan is None:
+        plan = _export_plans[key] = ExportPlan(app_name, for_action)
+
+    return plan
+
+
+def clear_export_plans():
+    """Remove all cached export plans (see `get_export_plan()`)."""
+    _export_plans.clear()
+
+
 #%% data export functions
 
 
-def get_hierarchical_data_for_apps(apps):
+def get_hierarchical_data_for_apps(apps, chunk_size=None, workers=None, participant_vars=True,
+                                   participant_vars_side_table=False, **session_filter):
     """
     Return a hierarchical data structure consisting of nested OrderedDicts for all data collected for apps listed
-    in `apps`. The format of the returned data structure is:
+    in `apps`. Sessions can be filtered via `session_filter` keyword arguments as accepted by
+    `get_session_ids_for_export()`. If `chunk_size` is given, database rows are fetched in chunks of this size. The
+    inclusion of participant variables can be controlled with `participant_vars` and `participant_vars_side_table`
+    (see `get_hierarchical_data_for_app()`).
+
+    If `workers` is greater than 1, the data for each app is fetched in a separate process using a pool of `workers`
+    processes, each with its own database connection. The result is the same as when fetching the apps one after
+    another. This requires the "fork" start method for child processes (i.e. it is not available on Windows) and
+    doesn't work with in-memory databases.
+
+    The format of the returned data structure is:
 
     ```
     {
@@ -131,60 +460,150 @@ def get_hierarchical_data_for_apps(apps):
     ```
     """
 
-    combined = OrderedDict()
+    app_kwargs = dict(chunk_size=chunk_size, participant_vars=participant_vars,
+                      participant_vars_side_table=participant_vars_side_table, **session_filter)
 
-    for app in apps:
-        sessions = get_hierarchical_data_for_app(app)
+    if workers is not None and workers > 1 and len(apps) > 1:
+        sessions_per_app = _get_hierarchical_data_for_apps_parallel(apps, workers, **app_kwargs)
+    else:
+        sessions_per_app = ((app, get_hierarchical_data_for_app(app, **app_kwargs)) for app in apps)
+
+    combined = OrderedDict()
 
+    for app, sessions in sessions_per_app:
         for sess in sessions:
             sesscode = sess['code']
-            if sesscode not in combined.keys():
-                combined[sesscode] = OrderedDict([(k, v) for k, v in sess.items() if k != '__subsession'])
-                combined[sesscode]['__apps'] = OrderedDict()
-
-            combined[sesscode]['__apps'][app] = sess['__subsession']
+            combined[sesscode] = _add_app_data_to_combined_session(combined.get(sesscode), app, sess)
 
     return combined
 
 
-def get_hierarchical_data_for_app(app_name, return_columns=False):
+def _get_hierarchical_data_for_apps_parallel(apps, workers, **kwargs):
     """
-    Generate hierarchical structured data for app `app_name`, optionally returning flattened field names.
+    Fetch the hierarchical data for each app in `apps` in a separate process using a pool of `workers` processes.
+    Additional keyword arguments are passed to `get_hierarchical_data_for_app()`. Yields tuples `(app, sessions)` in
+    the order given by `apps`.
     """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise RuntimeError('parallel data export requires the "fork" start method for child processes, which is not '
+                           'available on this platform')
 
-    models_module = get_models_module(app_name)
+    # the child processes must not use the database connections of this process -- close them, so that each child
+    # process opens its own connection (the connections are re-opened here automatically on the next query)
+    connections.close_all()
 
-    # get the standard models
-    Player = models_module.Player
-    Group = models_module.Group
-    Subsession = models_module.Subsession
+    mp_context = multiprocessing.get_context('fork')   # child processes inherit the complete Django setup
+    with ProcessPoolExecutor(max_workers=min(workers, len(apps)), mp_context=mp_context) as executor:
+        futures = [executor.submit(get_hierarchical_data_for_app, app, **kwargs) for app in apps]
+
+        for app, future in zip(apps, futures):
+            yield app, future.result()
+
+
+def iter_hierarchical_data_for_apps(apps, chunk_size=None, participant_vars=True, participant_vars_side_table=False,
+                                    **session_filter):
+    """
+    Generator variant of `get_hierarchical_data_for_apps()`: Instead of building the data structure for all sessions
+    in memory, yield tuples `(session code, session data)` one session at a time. The session data has the same format
+    as a single session entry in `get_hierarchical_data_for_apps()`. Sessions can be filtered via `session_filter`
+    keyword arguments as accepted by `get_session_ids_for_export()`. If `chunk_size` is given, database rows are
+    fetched in chunks of this size. The inclusion of participant variables can be controlled with `participant_vars`
+    and `participant_vars_side_table` (see `get_hierarchical_data_for_app()`).
+
+    The data for each session is fetched separately, so that peak memory usage is bounded by the largest session.
+    Use `otreeutils.scripts.save_data_as_json_stream()` to write the output incrementally to a JSON file.
+    """
+
+    # find out which sessions have data for which apps
+    session_ids_per_app = OrderedDict()
+    for app in apps:
+        Subsession = get_models_module(app).Subsession
+        session_ids_per_app[app] = get_session_ids_for_export(Subsession, **session_filter)
 
-    # get the custom models configuration
-    custom_models_conf = get_custom_models_conf(models_module, for_action='export_data')
+    all_session_ids = set()
+    for app_session_ids in session_ids_per_app.values():
+        all_session_ids.update(app_session_ids)
 
-    # build standard models' columns
-    columns_for_models = {m.__name__.lower(): export.get_fields_for_csv(m)
-                          for m in [Player, Group, Subsession, Participant, Session]}
+    # fetch and combine the data session by session
+    for sess_id in sorted(all_session_ids):
+        combined_sess = None
 
-    # build custom models' columns
-    columns_for_custom_models = get_custom_models_columns(custom_models_conf, for_action='export_data')
+        for app, app_session_ids in session_ids_per_app.items():
+            if sess_id not in app_session_ids:
+                continue
 
-    custom_models_links = get_links_between_std_and_custom_models(custom_models_conf, for_action='export_data')
-    std_models_select_related = defaultdict(list)
-    for smodel_class, cmodels_links in custom_models_links.items():
-        smodel_lwr = smodel_class.__name__.lower()
-        for cmodel_class, _ in cmodels_links:
-            std_models_select_related[smodel_lwr].append(cmodel_class.__name__.lower())
+            for sess in get_hierarchical_data_for_app(app, chunk_size=chunk_size, participant_vars=participant_vars,
+                                                      participant_vars_side_table=participant_vars_side_table,
+                                                      session_ids={sess_id}):
+                combined_sess = _add_app_data_to_combined_session(combined_sess, app, sess)
+
+        if combined_sess is not None:
+            yield combined_sess['code'], combined_sess
+
+
+def _add_app_data_to_combined_session(combined_sess, app, sess):
+    """
+    Add the subsessions of app `app` in session data `sess` to the combined session data `combined_sess` (which is
+    created if it is None). Return the combined session data.
+    """
+    if combined_sess is None:
+        combined_sess = OrderedDict([(k, v) for k, v in sess.items() if k != '__subsession'])
+        combined_sess['__apps'] = OrderedDict()
+    elif '__participant_vars' in sess:    # add participants that didn't occur in the previous apps
+        combined_sess['__participant_vars'].update(sess['__participant_vars'])
+
+    combined_sess['__apps'][app] = sess['__subsession']
+
+    return combined_sess
+
+
+def get_hierarchical_data_for_app(app_name, return_columns=False, chunk_size=None, participant_vars=True,
+                                  participant_vars_side_table=False, **session_filter):
+    """
+    Generate hierarchical structured data for app `app_name`, optionally returning flattened field names.
+    Sessions can be filtered via `session_filter` keyword arguments as accepted by `get_session_ids_for_export()`.
+
+    If `chunk_size` is given, database rows are fetched in chunks of this size instead of loading (and caching) each
+    query result as a whole. This keeps memory usage low for models with many rows. The output is the same in both
+    modes.
+
+    `participant_vars` controls the inclusion of the participant variables: True includes all variables, False
+    excludes them and a sequence of keys includes only these variables. The variables are only fetched from the
+    database and decoded if they are included. By default, they're added as "vars" to each participant entry,
+    i.e. repeated for each player of the participant. If `participant_vars_side_table` is True, they're instead added
+    once per participant to the session data as "__participant_vars" dict with `participant code -> vars`.
+    """
+
+    plan = get_export_plan(app_name, 'export_data')
+
+    # get the standard models
+    Player = plan.Player
+    Group = plan.Group
+    Subsession = plan.Subsession
+
+    # standard and custom models' columns
+    columns_for_models = plan.std_models_colnames
+    columns_for_custom_models = plan.custom_models_colnames
+
+    # links between models
+    custom_models_links = plan.links_to_custom_models
+    std_models_select_related = plan.std_models_select_related
 
     # create lists of IDs that will be used for the export
-    participant_ids = set(Player.objects.values_list('participant_id', flat=True))
-    session_ids = set(Subsession.objects.values_list('session_id', flat=True))
+    session_ids = get_session_ids_for_export(Subsession, **session_filter)
+
+    # database fields to fetch per model: only the exported columns and the IDs for linking the data
+    fields_for_models = {
+        'session': _fields_for_values(Session, columns_for_models['session'], ['id']),
+        'subsession': _fields_for_values(Subsession, columns_for_models['subsession'], ['id', 'session_id']),
+        'group': _fields_for_values(Group, columns_for_models['group'], ['id', 'subsession_id']),
+        'player': _fields_for_values(Player, columns_for_models['player'], ['id', 'group_id', 'participant_id']),
+    }
 
     # create standard model querysets
-    qs_participant = Participant.objects.filter(id__in=participant_ids)
     qs_player = Player.objects.filter(session_id__in=session_ids)\
         .order_by('id')\
-        .select_related(*std_models_select_related.get('player', [])).values()
+        .select_related(*std_models_select_related.get('player', []))
     qs_group = Group.objects.filter(session_id__in=session_ids)\
         .select_related(*std_models_select_related.get('group', []))
     qs_subsession = Subsession.objects.filter(session_id__in=session_ids)\
@@ -196,46 +615,90 @@ def get_hierarchical_data_for_app(app_name, return_columns=False):
                                                  # custom data prefetching
 
     # session ID -> subsession rows for this session
-    prefetch_subsess = _rows_per_key_from_queryset(qs_subsession, 'session_id')
+    prefetch_subsess = _rows_per_key_from_queryset(qs_subsession, 'session_id', chunk_size,
+                                                   fields_for_models['subsession'])
     prefetch_filter_ids_for_custom_models['subsession'] = _set_of_ids_from_rows_per_key(prefetch_subsess, 'id')
 
     # subsession ID -> group rows for this subsession
-    prefetch_group = _rows_per_key_from_queryset(qs_group, 'subsession_id')
+    prefetch_group = _rows_per_key_from_queryset(qs_group, 'subsession_id', chunk_size, fields_for_models['group'])
     prefetch_filter_ids_for_custom_models['group'] = _set_of_ids_from_rows_per_key(prefetch_group, 'id')
 
     # group ID -> player rows for this group
-    prefetch_player = _rows_per_key_from_queryset(qs_player, 'group_id')
+    prefetch_player = _rows_per_key_from_queryset(qs_player, 'group_id', chunk_size, fields_for_models['player'])
     prefetch_filter_ids_for_custom_models['player'] = _set_of_ids_from_rows_per_key(prefetch_player, 'id')
 
-    # prefetch dict for custom data models
-    prefetch_custom = defaultdict(dict)   # standard oTree model name -> custom model name -> data rows
-    for smodel, cmodel_links in custom_models_links.items():  # per oTree std. model
-        smodel_name_lwr = smodel.__name__.lower()
-
-        # IDs that occur for that model
-        filter_ids = prefetch_filter_ids_for_custom_models[smodel_name_lwr]
-
-        # iterate per custom model
-        for model, link_field_name in cmodel_links:
-            # prefetch custom model objects that are linked to these oTree std. model IDs
-            filter_kwargs = {link_field_name + '__in': filter_ids}
-            custom_qs = model.objects.filter(**filter_kwargs).values()
-
-            # store to the dict
-            m = model.__name__.lower()
-            prefetch_custom[smodel_name_lwr][m] = _rows_per_key_from_queryset(custom_qs, link_field_name)
+    # participant ID -> participant data for this participant (optionally including its decoded `vars`);
+    # fetched in a single query for all participants that occur in the player rows
+    participant_ids = _set_of_ids_from_rows_per_key(prefetch_player, 'participant_id')
+    prefetch_participant = {}
+    prefetch_participant_vars = defaultdict(OrderedDict)   # session ID -> participant code -> vars for side table
+    # participants are fetched as dicts instead of model instances: oTree's `VarsMixin` accesses `vars` on
+    # instantiation, which would load a deferred `vars` field with one extra query per participant
+    participant_cols = columns_for_models['participant']
+    participant_fields = _fields_for_values(Participant, participant_cols, ['id', 'session_id', 'code'])
+    if participant_vars:   # `vars` is only fetched (and unpickled) if requested
+        participant_fields.append('vars')
+    qs_participant = Participant.objects.filter(id__in=participant_ids).order_by('id').values(*participant_fields)
+    if chunk_size:
+        qs_participant = qs_participant.iterator(chunk_size=chunk_size)
+    for participant_row in qs_participant:
+        out_participant = OrderedDict((c, export.sanitize_for_csv(participant_row[f]))
+                                      for c, f in zip(participant_cols, _db_field_names(Participant, participant_cols)))
+
+        if participant_vars:
+            pvars = _select_participant_vars(participant_row['vars'], participant_vars)
+            if participant_vars_side_table:
+                prefetch_participant_vars[participant_row['session_id']][participant_row['code']] = pvars
+            else:
+                out_participant['vars'] = pvars
+
+        prefetch_participant[participant_row['id']] = out_participant
+
+    # prefetch dict for custom data models; custom models can also be linked to other custom models, so this is
+    # done level by level: first the custom models linked to oTree std. models, then the custom models linked to these
+    # custom models, etc. with one query per custom model
+    prefetch_custom = defaultdict(dict)   # linked model name -> custom model name -> data rows
+    pending_links = dict(custom_models_links)
+    while pending_links:
+        # linked models whose rows are already fetched
+        linked_models = [m for m in pending_links.keys() if m.__name__.lower() in prefetch_filter_ids_for_custom_models]
+        if not linked_models:
+            raise ValueError('custom models are linked to models that are not exported: %s'
+                             % ', '.join(m.__name__ for m in pending_links.keys()))
+
+        for linked_model in linked_models:
+            linked_model_name_lwr = linked_model.__name__.lower()
+
+            # IDs that occur for that model
+            filter_ids = prefetch_filter_ids_for_custom_models[linked_model_name_lwr]
+
+            # iterate per custom model
+            for model, link_field_name in pending_links.pop(linked_model):
+                # prefetch custom model objects that are linked to these IDs
+                filter_kwargs = {link_field_name + '__in': filter_ids}
+                custom_qs = model.objects.filter(**filter_kwargs)
+
+                # store to the dict
+                m = model.__name__.lower()
+                custom_fields = _fields_for_values(model, columns_for_custom_models[m], [link_field_name, 'id'])
+                custom_rows = _rows_per_key_from_queryset(custom_qs, link_field_name, chunk_size, custom_fields)
+                prefetch_custom[linked_model_name_lwr][m] = custom_rows
+                prefetch_filter_ids_for_custom_models[m] = _set_of_ids_from_rows_per_key(custom_rows, 'id')
 
     # build the final nested data structure
     output_nested = []
     ordered_columns_per_model = OrderedDict()
     # 1. each session
-    for sess in Session.objects.filter(id__in=session_ids).values():
+    for sess in Session.objects.filter(id__in=session_ids).values(*fields_for_models['session']):
         sess_cols = columns_for_models['session']
         if 'session' not in ordered_columns_per_model:
             ordered_columns_per_model['session'] = sess_cols
 
         out_sess = _odict_from_row(sess, sess_cols)
 
+        if participant_vars and participant_vars_side_table:
+            out_sess['__participant_vars'] = prefetch_participant_vars[sess['id']]
+
         # 1.1. each subsession in the session
         out_sess['__subsession'] = []
         for subsess in prefetch_subsess[sess['id']]:
@@ -246,14 +709,8 @@ def get_hierarchical_data_for_app(app_name, return_columns=False):
             out_subsess = _odict_from_row(subsess, subsess_cols)
 
             # 1.1.1. each possible custom models connected to this subsession
-            subsess_custom_models_rows = prefetch_custom.get('subsession', {})
-            for subsess_cmodel_name, subsess_cmodel_rows in subsess_custom_models_rows.items():
-                cmodel_cols = columns_for_custom_models[subsess_cmodel_name]
-                if subsess_cmodel_name not in ordered_columns_per_model:
-                    ordered_columns_per_model[subsess_cmodel_name] = cmodel_cols
-
-                out_subsess['__' + subsess_cmodel_name] = [_odict_from_row(cmodel_row, cmodel_cols)
-                                                           for cmodel_row in subsess_cmodel_rows[subsess['id']]]
+            _add_custom_models_data(out_subsess, 'subsession', subsess['id'], prefetch_custom,
+                                    columns_for_custom_models, ordered_columns_per_model)
 
             # 1.1.2. each group in this subsession
             out_subsess['__group'] = []
@@ -265,14 +722,8 @@ def get_hierarchical_data_for_app(app_name, return_columns=False):
                 out_grp = _odict_from_row(grp, grp_cols)
 
                 # 1.1.2.1. each possible custom models connected to this group
-                grp_custom_models_rows = prefetch_custom.get('group', {})
-                for grp_cmodel_name, grp_cmodel_rows in grp_custom_models_rows.items():
-                    cmodel_cols = columns_for_custom_models[grp_cmodel_name]
-                    if grp_cmodel_name not in ordered_columns_per_model:
-                        ordered_columns_per_model[grp_cmodel_name] = cmodel_cols
-
-                    out_grp['__' + grp_cmodel_name] = [_odict_from_row(cmodel_row, cmodel_cols)
-                                                       for cmodel_row in grp_cmodel_rows[grp['id']]]
+                _add_custom_models_data(out_grp, 'group', grp['id'], prefetch_custom,
+                                        columns_for_custom_models, ordered_columns_per_model)
 
                 # 1.1.2.2. each player in this group
                 out_grp['__player'] = []
@@ -288,21 +739,11 @@ def get_hierarchical_data_for_app(app_name, return_columns=False):
                     out_player = _odict_from_row(player, player_cols)
 
                     # 1.1.2.2.1. participant object connected to this player
-                    participant_obj = qs_participant.get(id=out_player['participant_id'])
-                    out_player['__participant'] = _odict_from_row(participant_obj,
-                                                                  columns_for_models['participant'],
-                                                                  is_obj=True)
-                    out_player['__participant']['vars'] = participant_obj.vars
+                    out_player['__participant'] = OrderedDict(prefetch_participant[player['participant_id']])
 
                     # 1.1.2.2.2. each possible custom models connected to this player
-                    player_custom_models_rows = prefetch_custom.get('player', {})
-                    for player_cmodel_name, player_cmodel_rows in player_custom_models_rows.items():
-                        cmodel_cols = columns_for_custom_models[player_cmodel_name]
-                        if player_cmodel_name not in ordered_columns_per_model:
-                            ordered_columns_per_model[player_cmodel_name] = cmodel_cols
-
-                        out_player['__' + player_cmodel_name] = [_odict_from_row(cmodel_row, cmodel_cols)
-                                                                 for cmodel_row in player_cmodel_rows[player['id']]]
+                    _add_custom_models_data(out_player, 'player', player['id'], prefetch_custom,
+                                            columns_for_custom_models, ordered_columns_per_model)
 
                     out_grp['__player'].append(out_player)
 
@@ -323,11 +764,34 @@ def get_hierarchical_data_for_app(app_name, return_columns=False):
         return output_nested
 
 
+def _add_custom_models_data(out, model_name, row_id, prefetch_custom, columns_for_custom_models,
+                            ordered_columns_per_model):
+    """
+    Add the rows of the custom models that are linked to the row with ID `row_id` of model `model_name` as lists
+    "__<custom model name>" to the output dict `out`. This is done recursively for custom models that are linked to
+    these custom models. `prefetch_custom` contains the custom models' rows per linked model and ID.
+    """
+    for cmodel_name, cmodel_rows in prefetch_custom.get(model_name, {}).items():
+        cmodel_cols = columns_for_custom_models[cmodel_name]
+        if cmodel_name not in ordered_columns_per_model:
+            ordered_columns_per_model[cmodel_name] = cmodel_cols
+
+        out_cmodel_rows = []
+        for cmodel_row in cmodel_rows[row_id]:
+            out_cmodel = _odict_from_row(cmodel_row, cmodel_cols)
+            _add_custom_models_data(out_cmodel, cmodel_name, cmodel_row['id'], prefetch_custom,
+                                    columns_for_custom_models, ordered_columns_per_model)
+            out_cmodel_rows.append(out_cmodel)
+
+        out['__' + cmodel_name] = out_cmodel_rows
+
+
 def get_links_between_std_and_custom_models(custom_models_conf, for_action):
     """
     Identify the links between custom models and standard models using custom models configuration `custom_models_conf`.
+    A custom model can also be linked to another custom model (which is then used as key instead of a standard model).
     Return as dict with lists:
-        standard model class -> list of tuples (custom model class, link field name)
+        standard or custom model class -> list of tuples (custom model class, link field name)
     """
 
     std_to_custom = defaultdict(list)
@@ -364,7 +828,8 @@ def get_modelnames_from_links_between_std_and_custom_models_structure(std_to_cus
 
 
 def get_dataframe_from_linked_models(std_models_querysets, links_to_custom_models,
-                                     std_models_colnames, custom_models_colnames):
+                                     std_models_colnames, custom_models_colnames,
+                                     custom_models_counts=False, aggregate_custom_models=False):
     """
     Create a dataframe that joins data from standard models in `std_models_querysets` with data from custom models
     via `links_to_custom_models`. Use columns defined in `std_models_colnames` for standard models and
@@ -375,118 +840,252 @@ def get_dataframe_from_linked_models(std_models_querysets, links_to_custom_model
     - the queryset to fetch the data
     - a tuple (left field name, right field name) defining the columns to use for joining the data
 
-    `links_to_custom_models` comes from `get_modelnames_from_links_between_std_and_custom_models_structure()` and is
-    a dict with lists: standard model name -> list of lowercase custom model names.
+    `links_to_custom_models` comes from `get_links_between_std_and_custom_models()` and is a dict with lists:
+    standard model class -> list of tuples (custom model class, link field name).
+
+    The first dataframe fetched via `std_models_querysets` defines the base data. All other dataframes are indexed by
+    the column for the right side of their join and then left-joined with the base data (see `join_dataframes()`).
+    Custom models are joined on the ID of the standard model they're linked to.
 
-    The first dataframe fetched via `std_models_querysets` defines the base data. Every following dataframe will be
-    joined with the base dataframe and result in a new base dataframe to be joined in the next iteration. A left join
-    will be performed for each iteration using the model links defined in each `std_models_querysets` row.
+    If `custom_models_counts` is True, a column "_count" is added to each custom model with the number of rows of
+    this custom model that belong to the same row of the standard model (for custom models linked to other custom
+    models: the standard model at the root of the links). If `aggregate_custom_models` is True, only the last row (i.e.
+    the row with the highest ID) of each custom model per row of this standard model is joined, so that the custom
+    models don't multiply the rows of the standard models.
 
     Returns a data frame of joined data. Each column is prefixed by the lowercase model name, e.g. "player.payoff".
     """
-    df = None   # base dataframe
+    df_base = None
+    joins = []     # tuples (left key, right dataframe indexed by right key)
+    columns = []   # output columns in order
 
     # iterate through each standard model queryset
     for smodel, smodel_qs, (smodel_link_left, smodel_link_right) in std_models_querysets:
         smodel_name = smodel.__name__
         smodel_name_lwr = smodel_name.lower()
-        smodel_colnames = std_models_colnames[smodel_name_lwr]
+        smodel_colnames = list(std_models_colnames[smodel_name_lwr])
 
         if 'id' not in smodel_colnames:   # always add the ID field (necessary for joining)
-            smodel_colnames += ['id']
+            smodel_colnames.append('id')
 
-        # optionally add field for the right side of the join
-        remove_right_link_col = False   # remove it after joining
-        if smodel_link_right:
-            smodel_link_right_reduced = smodel_link_right[smodel_link_right.rindex('.')+1:]
-            if smodel_link_right_reduced not in smodel_colnames:
-                remove_right_link_col = True
-                smodel_colnames += [smodel_link_right_reduced]
-
-        # special handling for Player's attributes group, payoff and role
+        # special handling for Player's attributes group and role (role is always the last column)
         if smodel_name == 'Player':
-            if 'payoff' in smodel_colnames:
-                smodel_colnames[smodel_colnames.index('payoff')] = '_payoff'
-            smodel_colnames = [c for c in smodel_colnames if c not in {'role', 'group'}]
+            smodel_colnames = [c for c in smodel_colnames if c not in {'role', 'group'}] + ['role']
 
-        if not smodel_qs.exists():   # create empty data frame with given column names
-            df_smodel = pd.DataFrame(OrderedDict((c, []) for c in smodel_colnames))
-        else:                        # create and fill data frame fetching values from the queryset
-            df_smodel = pd.DataFrame(list(smodel_qs.values()))[smodel_colnames]
+        if smodel_link_right:
+            smodel_link_right = smodel_link_right[smodel_link_right.rindex('.')+1:]
 
-        # special handling for Player's attributes payoff and role
-        if smodel_name == 'Player':
-            df_smodel.rename(columns={'_payoff': 'payoff'}, inplace=True)
-            df_smodel['role'] = [p.role() if p.role else '' for p in smodel_qs]
+        smodel_qs = smodel_qs.order_by('id')
+        df_smodel = _dataframe_from_queryset(smodel_qs, smodel, smodel_colnames, smodel_name_lwr,
+                                             join_key=smodel_link_right)
 
-        # prepend model name to each column
-        renamings = dict((c, smodel_name_lwr + '.' + c) for c in df_smodel.columns)
-        df_smodel.rename(columns=renamings, inplace=True)
+        columns.extend(smodel_name_lwr + '.' + c for c in smodel_colnames)
 
-        if df is None:   # first dataframe is used as base dataframe
+        if df_base is None:   # first dataframe is used as base dataframe
             assert smodel_link_left is None and smodel_link_right is None
-            df = df_smodel
-        else:            # perform the left join, use result as new base dataframe for next iteration
-            df = pd.merge(df, df_smodel, how='left', left_on=smodel_link_left, right_on=smodel_link_right)
+            df_base = df_smodel
+        else:
+            joins.append((smodel_link_left, df_smodel))
+
+        # custom model(s) linked to this standard model
+        _add_custom_models_joins(smodel, smodel_qs, links_to_custom_models, custom_models_colnames, joins, columns,
+                                 std_model_name_lwr=smodel_name_lwr, counts=custom_models_counts,
+                                 aggregate=aggregate_custom_models)
+
+    return join_dataframes(df_base, joins, columns)
+
+
+def _add_custom_models_joins(linked_model, linked_qs, links_to_custom_models, custom_models_colnames,
+                             joins, columns, std_model_name_lwr=None, std_ids=None, counts=False, aggregate=False):
+    """
+    Fetch the data of the custom models that are linked to the rows of `linked_qs` of model `linked_model` (see
+    `get_dataframe_from_linked_models()`). Add a join on the ID of the linked model for each custom model to `joins`
+    and its column names to `columns`. This is done recursively for custom models that are linked to these custom
+    models.
+
+    `std_model_name_lwr` is the lowercase name of the standard model at the root of the links and `std_ids` maps IDs
+    of the linked custom model to IDs of this standard model (None if the linked model is the standard model). They're
+    used for `counts` and `aggregate` as explained in `get_dataframe_from_linked_models()`.
+    """
+    linked_model_name_lwr = linked_model.__name__.lower()
+
+    for cmodel, cmodel_link_field_name in links_to_custom_models.get(linked_model, []):
+        cmodel_name_lwr = cmodel.__name__.lower()
+        cmodel_colnames = custom_models_colnames[cmodel_name_lwr]
+        has_children = cmodel in links_to_custom_models
+
+        # the ID is needed for joining custom models that are linked to this custom model
+        if has_children and 'id' not in cmodel_colnames:
+            fetch_colnames = cmodel_colnames + ['id']
+        else:
+            fetch_colnames = cmodel_colnames
+
+        # fetch only the rows linked to the fetched rows of the linked model
+        cmodel_qs = cmodel.objects.filter(**{cmodel_link_field_name + '__in': linked_qs.values('id')})\
+            .order_by('id')
+        df_cmodel = _dataframe_from_queryset(cmodel_qs, cmodel, fetch_colnames, cmodel_name_lwr,
+                                             join_key=cmodel_link_field_name)
+        left_key = linked_model_name_lwr + '.id'
+        child_std_ids = None
+
+        if counts or aggregate:
+            # IDs of the standard model at the root of the links for each row
+            if std_ids is None:
+                cmodel_std_ids = df_cmodel.index.to_numpy()
+            else:
+                cmodel_std_ids = std_ids.reindex(df_cmodel.index).to_numpy()
+
+            if has_children:   # custom models linked to this custom model need these IDs, too
+                child_std_ids = pd.Series(cmodel_std_ids, index=df_cmodel[cmodel_name_lwr + '.id'].to_numpy())
+
+            if counts:   # joined separately on the ID of the standard model
+                n_per_std_id = pd.Series(cmodel_std_ids).value_counts(sort=False)
+                joins.append((std_model_name_lwr + '.id', n_per_std_id.to_frame(cmodel_name_lwr + '._count')))
+
+            if aggregate:   # only keep the last row per row of the standard model
+                is_last = ~pd.Index(cmodel_std_ids).duplicated(keep='last')
+                df_cmodel = df_cmodel[is_last]
+                df_cmodel.index = pd.Index(cmodel_std_ids[is_last])
+                left_key = std_model_name_lwr + '.id'
+
+        if counts:
+            columns.append(cmodel_name_lwr + '._count')
+        columns.extend(cmodel_name_lwr + '.' + c for c in cmodel_colnames)
+
+        joins.append((left_key, df_cmodel))
+
+        _add_custom_models_joins(cmodel, cmodel_qs, links_to_custom_models, custom_models_colnames, joins, columns,
+                                 std_model_name_lwr=std_model_name_lwr, std_ids=child_std_ids,
+                                 counts=counts, aggregate=aggregate)
+
+
+def join_dataframes(df_base, joins, columns=None):
+    """
+    Left-join dataframes to the base dataframe `df_base`. `joins` is a sequence of tuples `(left key, right
+    dataframe)`, where each right dataframe is indexed by the values of its join key. The left key is a column in the
+    base dataframe or in a preceding right dataframe.
 
-        if smodel in links_to_custom_models:  # we have custom model(s) linked to this standard model
-            for cmodel, cmodel_link_field_name in links_to_custom_models[smodel]:
-                cmodel_name = cmodel.__name__
-                cmodel_name_lwr = cmodel_name.lower()
+    The joins are performed in the given order, so the columns of the joined dataframe are already in the order of
+    the joins. Reordering the columns afterwards would copy the complete joined data, which is why joins with a unique
+    right index are *not* moved before the joins that multiply rows.
 
-                # fetch only the needed IDs
-                smodel_ids = df_smodel[smodel_name_lwr + '.id'].unique()
-                cmodel_qs = cmodel.objects.filter(**{cmodel_link_field_name + '__in': smodel_ids})
-                cmodel_colnames = custom_models_colnames[cmodel_name_lwr]
+    Returns the joined dataframe with columns `columns` in this order (or in the order of the joins if `columns` is
+    None) and a default index.
+    """
+    df = df_base
+    for left_key, df_right in joins:
+        df = df.join(df_right, on=left_key, how='left')
 
-                # optionally add field for the right side of the join
-                remove_cmodel_link_field_name = False       # remove it after joining
-                if cmodel_link_field_name not in cmodel_colnames:
-                    cmodel_colnames += [cmodel_link_field_name]
-                    remove_cmodel_link_field_name = True
+    if columns is not None and list(df.columns) != list(columns):
+        df = df[columns]   # copies the data; not necessary when `columns` are given in the order of the joins
 
-                if not cmodel_qs.exists():   # create empty data frame with given column names
-                    df_cmodel = pd.DataFrame(OrderedDict((c, []) for c in cmodel_colnames))
-                else:                        # create and fill data frame fetching values from the queryset
-                    df_cmodel = pd.DataFrame(list(cmodel_qs.values()))[cmodel_colnames]
+    df.index = pd.RangeIndex(len(df))   # set default index without copying the data
 
-                # prepend model name to each column
-                renamings = dict((c, cmodel_name_lwr + '.' + c) for c in df_cmodel.columns)
-                df_cmodel.rename(columns=renamings, inplace=True)
+    return df
 
-                cmodel_link_field_name = cmodel_name_lwr + '.' + cmodel_link_field_name
 
-                # perform the left join, use result as new base dataframe for next iteration
-                df = pd.merge(df, df_cmodel, how='left',
-                              left_on=smodel_name_lwr + '.id',
-                              right_on=cmodel_link_field_name)
+def _dataframe_from_queryset(qs, model, columns, prefix=None, join_key=None):
+    """
+    Fetch the fields `columns` of model `model` from queryset `qs` in a single query and create a dataframe with these
+    columns, optionally each prefixed by `prefix` and a dot. If `join_key` is given, the values of this field are used
+    as index of the dataframe. The key is fetched additionally if it is not in `columns` and is not kept as column
+    then. For Player models, the "role" column is determined via `get_player_roles()`.
+    """
+    fetch_columns = list(columns)
+    extra_columns = []    # columns that are only fetched for the index or for determining the roles
+
+    if join_key is not None and join_key not in fetch_columns:
+        extra_columns.append(join_key)
+
+    add_roles = issubclass(model, BasePlayer) and 'role' in columns
+    if add_roles:
+        fetch_columns.remove('role')
+        extra_columns.extend(c for c in _PLAYER_ROLE_FIELDS if c not in fetch_columns and c not in extra_columns)
 
-                if remove_cmodel_link_field_name:
-                    del df[cmodel_link_field_name]
+    fetch_columns.extend(extra_columns)
+    df = pd.DataFrame.from_records(list(qs.values_list(*_db_field_names(model, fetch_columns))),
+                                   columns=fetch_columns)
 
-        if remove_right_link_col:
-            del df[smodel_link_right]
+    if add_roles:
+        roles = get_player_roles(model, {c: df[c].tolist() for c in _PLAYER_ROLE_FIELDS}, db=qs.db)
+        df.insert(columns.index('role'), 'role', roles)
+
+    if join_key is not None:
+        index = pd.Index(df[join_key].to_numpy())
+    else:
+        index = None
+
+    for c in extra_columns:
+        del df[c]
+
+    if index is not None:
+        df.index = index
+
+    if prefix:
+        df.columns = [prefix + '.' + c for c in df.columns]
 
     return df
 
 
+def get_player_roles(Player, values, db=None):
+    """
+    Determine the role of each player of model `Player` from its field values `values`, given as dict that maps field
+    attribute names to lists of values (one per player). It must contain the fields "id", "subsession_id",
+    "id_in_group" and "_role".
+
+    If `Player.role` is oTree's default property, the stored `_role` values are used. If `role` is overridden (e.g.
+    by a `role()` method), the role is determined only once per subsession and `id_in_group` from a player instance
+    created from these field values, i.e. without querying the database again. `db` is the database alias for
+    creating the instances.
+
+    This requires that an overridden `role` only depends on `id_in_group` and the subsession (as oTree's convention of
+    assigning roles by `id_in_group` does). If `role` depends on other fields of the player or on related objects
+    (e.g. participant vars or the payoff), the role of the first player of each subsession and `id_in_group` is
+    used for all other players with the same subsession and `id_in_group`, which is wrong when these players differ in
+    those fields.
+
+    Returns a list with the role of each player.
+    """
+    if Player.role is BasePlayer.role:
+        return [r or '' for r in values['_role']]
+
+    # attribute names in order of the model's concrete fields as required by `Model.from_db()`
+    field_names = [f.attname for f in Player._meta.concrete_fields if f.attname in values]
+    keys = list(zip(values['subsession_id'], values['id_in_group']))
+    roles_per_key = {}
+
+    for i, key in enumerate(keys):
+        if key not in roles_per_key:
+            player = Player.from_db(db, field_names, [values[f][i] for f in field_names])
+            role = player.role
+            roles_per_key[key] = role() if callable(role) else role
+
+    return [roles_per_key[key] for key in keys]
+
+
 def get_custom_models_conf(models_module, for_action):
     """
     Obtain the custom models defined in the models.py module `models_module` of an app for a certain action (`data_view`
     or `export_data`).
 
     These models must have a subclass `CustomModelConf` with the respective configuration attributes `data_view`
-    or `export_data`.
+    or `export_data`. Standard models (player, group and subsession) are not custom models even if they have a
+    `CustomModelConf` (which they may use for declaring aggregates, see `get_aggregates_conf()`). Models that are
+    imported from other apps are ignored.
 
     Returns a dictionary with `model name` -> `model config dict`.
     """
     assert for_action in ('data_view', 'export_data')
 
+    app_label = get_app_label_from_import_path(models_module.__name__)
     custom_models_conf = {}
     for attr in dir(models_module):
         val = getattr(models_module, attr)
         try:
-            if issubclass(val, Model):   # must be a django model
+            # must be a concrete django model of this app that is not a standard model (the abstract otree
+            # `Model` base class that is imported in the models module has no `_meta`)
+            if issubclass(val, Model) and getattr(getattr(val, '_meta', None), 'app_label', None) == app_label \
+                    and not issubclass(val, (BasePlayer, BaseGroup, BaseSubsession)):
                 metaclass = getattr(val, 'CustomModelConf', None)
                 if metaclass and hasattr(metaclass, for_action):
                     custom_models_conf[attr] = {
@@ -557,105 +1156,543 @@ def get_custom_models_conf_per_app(session):
 
     custom_models_conf_per_app = {}
     for app_name in session.config['app_sequence']:
-        models_module = get_models_module(app_name)
-        conf = get_custom_models_conf(models_module, for_action='data_view')
+        conf = get_export_plan(app_name, 'data_view').custom_models_conf
         if conf:
             custom_models_conf_per_app[app_name] = conf
 
     return custom_models_conf_per_app
 
 
+def get_aggregates_conf(models_module):
+    """
+    Obtain the aggregates declared for the session data monitor in the models.py module `models_module` of an app. The
+    aggregates are declared for a model (standard or custom model) in `data_view['aggregates']` of its
+    `CustomModelConf` as list of dicts with the following keys:
+
+    - `name`: name of the aggregate
+    - `function`: aggregate function; one of "count", "sum", "avg", "min", "max"
+    - `field`: field to aggregate; optional for "count" (counts rows then)
+    - `group_by`: optional list of fields (or lookups like "seller__round_number") to group by
+
+    Models that are imported from other apps are ignored. Returns a list of tuples (model class, aggregate dict).
+    """
+    app_label = get_app_label_from_import_path(models_module.__name__)
+    aggregates = []
+    for attr in dir(models_module):
+        val = getattr(models_module, attr)
+        try:
+            if not issubclass(val, Model) or getattr(getattr(val, '_meta', None), 'app_label', None) != app_label:
+                continue
+        except TypeError:
+            continue
+
+        data_view = getattr(getattr(val, 'CustomModelConf', None), 'data_view', None) or {}
+        for aggr in data_view.get('aggregates', []):
+            if aggr.get('function') not in _AGGREGATE_FUNCTIONS:
+                raise ValueError('aggregate "%s" of model %s: function must be one of %s'
+                                 % (aggr.get('name'), val.__name__, ', '.join(_AGGREGATE_FUNCTIONS.keys())))
+            if aggr['function'] != 'count' and not aggr.get('field'):
+                raise ValueError('aggregate "%s" of model %s: a field must be given for function "%s"'
+                                 % (aggr.get('name'), val.__name__, aggr['function']))
+            aggregates.append((val, aggr))
+
+    return aggregates
+
+
+def get_session_aggregates(session):
+    """
+    Compute the aggregates for the session data monitor for `session`: the number of participants per app and page
+    and the aggregates declared for the models of each app in the session (see `get_aggregates_conf()`). Each
+    aggregate is computed with a single GROUP BY query.
+
+    Returns a list of dicts with `app` (None for the participants aggregate), `model`, `name`, `columns` and `rows`.
+    """
+    participants_per_page = Participant.objects.filter(session=session)\
+        .values_list('_current_app_name', '_current_page_name')\
+        .annotate(n=Count('id'))\
+        .order_by('_current_app_name', '_current_page_name')
+
+    aggregates = [{
+        'app': None,
+        'model': 'Participant',
+        'name': 'participants per page',
+        'columns': ['app', 'page', 'count'],
+        'rows': [[_format_aggregate_value(v) for v in row] for row in participants_per_page],
+    }]
+
+    for app_name in session.config['app_sequence']:
+        plan = get_export_plan(app_name, 'data_view')
+        custom_models = {conf['class'] for conf in plan.custom_models_conf.values()}
+
+        for model, aggr in get_aggregates_conf(plan.models_module):
+            if model in custom_models:
+                session_lookup = _session_lookup_for_custom_model(model, plan.custom_models_conf, 'data_view')
+            else:
+                session_lookup = 'session_id'
+
+            group_by = list(aggr.get('group_by', []))
+            aggr_func = _AGGREGATE_FUNCTIONS[aggr['function']]
+            aggr_field = aggr.get('field') or 'id'
+
+            qs = model.objects.filter(**{session_lookup: session.id})
+            if group_by:
+                rows = [list(row) for row in qs.values_list(*group_by).annotate(value=aggr_func(aggr_field))
+                                                .order_by(*group_by)]
+            else:
+                rows = [[qs.aggregate(value=aggr_func(aggr_field))['value']]]
+
+            aggregates.append({
+                'app': app_name,
+                'model': model.__name__,
+                'name': aggr.get('name') or '%s(%s)' % (aggr['function'], aggr_field),
+                'columns': group_by + ['%s(%s)' % (aggr['function'], aggr_field)],
+                'rows': [[_format_aggregate_value(v) for v in row] for row in rows],
+            })
+
+    return aggregates
+
+
+def _format_aggregate_value(x):
+    """Format a value of an aggregate for display (the template takes care of escaping)."""
+    x = export.sanitize_for_csv(x)
+    if isinstance(x, (float, Decimal)):
+        x = round(x, 3)
+    return str(x)
+
+
 def get_rows_for_data_tab(session):
     """
-    Overridden function from `otree.export` module to provide data rows for the session data monitor.
+    Overridden function from `otree.export` module to provide data rows for the session data monitor. This is the
+    first version of the data protocol, which provides all rows of the custom models without "_count" columns.
     """
     for app_name in session.config['app_sequence']:
-        yield from get_rows_for_data_tab_app(session, app_name)
+        yield from get_rows_for_data_tab_app(session, app_name, expand_custom_models=True, custom_models_counts=False)
 
 
-def get_rows_for_data_tab_app(session, app_name):
+def get_rows_for_data_tab_app(session, app_name, round_number=None, expand_custom_models=False,
+                              custom_models_counts=True):
     """
     Overridden function from `otree.export` module to provide data rows for the session data monitor for a specific app.
+    If `round_number` is given, only the rows for this round are provided.
+
+    By default, the custom models are aggregated per row of the standard model they're linked to, i.e. only their last
+    row is shown along with the number of their rows in the column "_count". If `expand_custom_models` is True, all
+    rows of the custom models are joined (which multiplies the rows of the standard models). If
+    `custom_models_counts` is False, the "_count" columns are omitted.
     """
 
-    models_module = get_models_module(app_name)
-    Player = models_module.Player
-    Group = models_module.Group
-    Subsession = models_module.Subsession
+    plan = get_export_plan(app_name, 'data_view')
+    Player = plan.Player
+    Group = plan.Group
+    Subsession = plan.Subsession
 
-    pfields, gfields, sfields = export.get_fields_for_data_tab(app_name)
+    # column names for standard and custom models
+    std_models_colnames = plan.data_tab_colnames
+    custom_models_colnames = plan.custom_models_colnames
 
-    # find out column names for standard models
-    std_models_colnames = dict(zip(('player', 'group', 'subsession'), (pfields, gfields, sfields)))
+    # links between standard and custom models
+    links_to_custom_models = plan.links_to_custom_models
 
-    # get custom model configuration, if there is any
-    custom_models_conf = get_custom_models_conf(models_module, for_action='data_view')
+    # all displayed columns in their order
+    if custom_models_counts:
+        all_colnames = plan.data_tab_columns
+        count_colnames = [m + '._count' for m in plan.data_tab_custom_models_colnames.keys()]
+    else:
+        all_colnames = plan.data_tab_columns_without_counts
+        count_colnames = []
 
-    # find out column names for custom models
-    custom_models_colnames = get_custom_models_columns(custom_models_conf, for_action='data_view')
+    # subsessions (i.e. rounds) in the order of their tables
+    qs_subsession = Subsession.objects.filter(session=session).order_by('round_number')
+    if round_number is not None:
+        qs_subsession = qs_subsession.filter(round_number=round_number)
 
-    # identify links between standard and custom models
-    links_to_custom_models = get_links_between_std_and_custom_models(custom_models_conf, for_action='data_view')
+    subsess_ids = [row['id'] for row in qs_subsession.values('id')]
+    if not subsess_ids:
+        return
 
-    # all displayed columns in their order
-    all_colnames = combine_column_names(std_models_colnames, custom_models_colnames)
-
-    # iterate through the subsessions (i.e. rounds)
-    for subsess_id in Subsession.objects.filter(session=session).values('id'):
-        subsess_id = subsess_id['id']
-        # pre-filter querysets to get only data of this subsession
-        filter_in_subsess = dict(subsession_id__in=[subsess_id])
-
-        # define querysets for standard models and their links for merging as left index, right index
-        # the order is important!
-        std_models_querysets = (
-            (Subsession, Subsession.objects.filter(id=subsess_id), (None, None)),
-            (Group, Group.objects.filter(**filter_in_subsess), ('subsession.id', 'group.subsession_id')),
-            (Player, Player.objects.filter(**filter_in_subsess), ('group.id', 'player.group_id')),
-        )
+    # pre-filter querysets to get only data of these subsessions
+    filter_in_subsess = dict(subsession_id__in=subsess_ids)
+
+    # define querysets for standard models and their links for merging as left index, right index
+    # the order is important!
+    std_models_querysets = (
+        (Subsession, Subsession.objects.filter(id__in=subsess_ids), (None, None)),
+        (Group, Group.objects.filter(**filter_in_subsess), ('subsession.id', 'group.subsession_id')),
+        (Player, Player.objects.filter(**filter_in_subsess), ('group.id', 'player.group_id')),
+    )
+
+    # create a dataframe for the complete data of all these subsessions incl. custom models data, i.e. with one
+    # query per model independent of the number of rounds
+    df = get_dataframe_from_linked_models(std_models_querysets, links_to_custom_models,
+                                          std_models_colnames, custom_models_colnames,
+                                          custom_models_counts=custom_models_counts,
+                                          aggregate_custom_models=not expand_custom_models)
+
+    # rows without linked custom model data
+    if count_colnames:
+        df[count_colnames] = df[count_colnames].fillna(0)
+
+    # row positions per subsession; the rows keep their order within each subsession
+    rows_per_subsess = df.groupby('subsession.id', sort=False).indices
+
+    # sanitize each value
+    df = sanitize_dataframe_for_live_update(df)\
+        .rename(columns={'group.id_in_subsession': 'player.group'})[all_colnames]
+    rows = df.to_dict(orient='split')['data']
+
+    # partition the rows into one table per subsession
+    for subsess_id in subsess_ids:
+        yield [rows[i] for i in rows_per_subsess.get(subsess_id, ())]
+
+
+def get_data_tab_update(session, known_hashes, app_name=None, round_number=None, compact=False,
+                        expand_custom_models=False, offset=0, limit=None, fingerprint=None):
+    """
+    Provide an update of the tables in the session data monitor (one table per subsession of each app in `session`)
+    for a client that already knows the versions of the tables identified by `known_hashes` (a sequence with one hash
+    per table as returned by this function; use an empty string for unknown tables). If `app_name` and `round_number`
+    are given, only the table for this subsession is provided and `known_hashes` only contains the hash for this table.
+
+    Returns a dict with the protocol `version` (2) and a list of `tables` with an entry per table, which is:
+
+    - None if the table was not modified, i.e. its current hash is the known hash;
+    - a dict with the current `hash` and the number of rows `n_rows` and a `patch` with only the new or changed rows
+      as list of `[row index, row]` pairs, if the known version of the table is still in the cache;
+    - otherwise a dict with the current `hash` and all `rows` of the table.
+
+    If `compact` is True, the rows are encoded with `encode_rows_compact()`: `rows` is replaced by `rows_compact` and
+    `patch` is replaced by `patch_indices` (the row indices) and `patch_compact` (the encoded rows).
+
+    Custom models are aggregated unless `expand_custom_models` is True (see `get_rows_for_data_tab_app()`). Each table
+    is restricted to the page of at most `limit` rows (or all rows if `limit` is None) starting at row `offset`; the
+    hashes, row indices and `n_rows` refer to this page. Modified tables additionally contain the total number of rows
+    `n_rows_total` and the `offset`.
+
+    `fingerprint` is the session data fingerprint if it was already computed for the current request (see
+    `get_shared_rows_for_data_tab()`).
+    """
+    if app_name is None:
+        rows_per_table = (rows for a in session.config['app_sequence']
+                          for rows in get_rows_for_data_tab_app(session, a, expand_custom_models=expand_custom_models))
+    elif round_number is None:
+        rows_per_table = get_rows_for_data_tab_app(session, app_name, expand_custom_models=expand_custom_models)
+    else:   # rows are shared between concurrent viewers
+        rows = get_shared_rows_for_data_tab(session, app_name, round_number,
+                                            expand_custom_models=expand_custom_models, fingerprint=fingerprint)
+        rows_per_table = [] if rows is None else [rows]
+
+    data_tab_cache = get_data_tab_cache()
+    tables = []
+    for i, rows in enumerate(rows_per_table):
+        n_rows_total = len(rows)
+        rows = rows[offset:] if limit is None else rows[offset:offset + limit]
+        table_hash = _data_digest([n_rows_total, offset, rows])
+        known_hash = known_hashes[i] if i < len(known_hashes) else ''
+
+        if table_hash == known_hash:
+            tables.append(None)
+            continue
+
+        data_tab_cache.set(_data_tab_cache_key(session, table_hash), rows, _DATA_TAB_CACHE_TIMEOUT)
+
+        known_rows = data_tab_cache.get(_data_tab_cache_key(session, known_hash)) if known_hash else None
+        if known_rows is None:
+            if compact:
+                table = {'hash': table_hash, 'rows_compact': encode_rows_compact(rows)}
+            else:
+                table = {'hash': table_hash, 'rows': rows}
+        else:
+            patch = [[i_row, row] for i_row, row in enumerate(rows)
+                     if i_row >= len(known_rows) or row != known_rows[i_row]]
+            if compact:
+                table = {'hash': table_hash, 'n_rows': len(rows), 'patch_indices': [p[0] for p in patch],
+                         'patch_compact': encode_rows_compact([p[1] for p in patch])}
+            else:
+                table = {'hash': table_hash, 'n_rows': len(rows), 'patch': patch}
+
+        table.update(n_rows_total=n_rows_total, offset=offset)
+        tables.append(table)
+
+    return {'version': 2, 'tables': tables}
+
+
+def encode_rows_compact(rows):
+    """
+    Encode `rows` (a list of rows of equal length with sanitized values as strings) in a compact columnar format for
+    transferring them to the session data monitor. Returns a dict with the number of rows `n_rows` and a list of
+    `columns`, where each column is encoded as one of the following dicts (checked in this order):
+
+    - `{"c": value}` for a constant column;
+    - `{"r": [values], "n": [run lengths]}` (run-length encoding) if there are at most `n_rows / 4` runs of equal
+      values, e.g. for IDs of groups;
+    - `{"d": [distinct values], "i": [indices into distinct values]}` (dictionary encoding) if there are at most
+      `n_rows / 2` distinct values, e.g. for role names;
+    - `{"v": [values]}` otherwise.
+
+    Values of the same column are placed next to each other, which also helps HTTP compression.
+    """
+    n_rows = len(rows)
+    columns = []
+    for values in zip(*rows):
+        # runs of equal values
+        run_values = []
+        run_lengths = []
+        for v in values:
+            if run_lengths and v == run_values[-1]:
+                run_lengths[-1] += 1
+            else:
+                run_values.append(v)
+                run_lengths.append(1)
+
+        if len(run_values) == 1:
+            columns.append({'c': run_values[0]})
+            continue
+
+        if len(run_values) <= n_rows // 4:
+            columns.append({'r': run_values, 'n': run_lengths})
+            continue
+
+        # codes for distinct values in order of their first occurrence
+        codes = {}
+        indices = [codes.setdefault(v, len(codes)) for v in values]
+
+        if len(codes) <= n_rows // 2:
+            columns.append({'d': list(codes.keys()), 'i': indices})
+        else:
+            columns.append({'v': list(values)})
+
+    return {'n_rows': n_rows, 'columns': columns}
+
+
+def get_session_data_fingerprint(session):
+    """
+    Compute a cheap fingerprint of the data shown in the session data monitor for `session`, i.e. without fetching and
+    joining the data. It is computed from the number of rows and the maximum ID of the players, groups and custom
+    models (for the data view) of each app in the session and the modification counters that are changed when
+    these objects are saved or deleted (see `signals` module). This needs one aggregate query per model.
+
+    The modification counters are kept in the cache of the session data monitor (see `get_data_tab_cache()`). With
+    the default local-memory cache, modifications are only detected within a single server process (which is oTree's
+    default). When running several server processes, a cache "otreeutils" that all processes share must be configured.
+    Changes that don't emit model signals (e.g. `QuerySet.update()`) are only detected if they change the number of
+    rows or the maximum ID.
+    """
+    parts = [signals.get_session_modification_counter(session.id)]
+
+    for app_name in session.config['app_sequence']:
+        plan = get_export_plan(app_name, 'data_view')
+
+        custom_models = [conf['class'] for conf in plan.custom_models_conf.values()]
+        models_lookups = [(plan.Player, 'session_id'), (plan.Group, 'session_id')]
+        models_lookups.extend((m, _session_lookup_for_custom_model(m, plan.custom_models_conf, 'data_view'))
+                              for m in custom_models)
+
+        for model, session_lookup in models_lookups:
+            stats = model.objects.filter(**{session_lookup: session.id}).aggregate(n=Count('id'), max_id=Max('id'))
+            parts.extend([app_name, model.__name__, stats['n'], stats['max_id']])
 
-        # create a dataframe for this subsession's complete data incl. custom models data
-        df = get_dataframe_from_linked_models(std_models_querysets, links_to_custom_models,
-                                              std_models_colnames, custom_models_colnames)
+        parts.extend(signals.get_model_modification_counters(custom_models))
+
+    return _data_digest(parts)
+
+
+class _BoundedLocalCache:
+    """
+    Thread-safe in-process cache for the session data monitor. It provides the part of Django's cache API that is used
+    here (`get()`, `get_many()`, `set()`, `add()`, `incr()` and `delete()`) and keeps at most `max_entries` entries with a
+    total size of their pickled values of at most `max_size` bytes. The least recently used entries are evicted first. A
+    value that alone exceeds `max_size` is not kept at all. `default_timeout` is the timeout in seconds for entries that
+    are set without timeout; a timeout of None means that the entry doesn't expire.
+    """
+    def __init__(self, max_entries, max_size, default_timeout):
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._default_timeout = default_timeout
+        self._entries = OrderedDict()   # key -> (expiry time or None, pickled value) in order of least recent usage
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            pickled = self._get_pickled(key)
+        return default if pickled is None else pickle.loads(pickled)
+
+    def get_many(self, keys):
+        with self._lock:
+            pickled_per_key = {k: self._get_pickled(k) for k in keys}
+        return {k: pickle.loads(pickled) for k, pickled in pickled_per_key.items() if pickled is not None}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._set_pickled(key, pickled, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._get_pickled(key) is not None:
+                return False
+            self._set_pickled(key, pickled, timeout)
+            return True
+
+    def incr(self, key, delta=1):
+        with self._lock:
+            pickled = self._get_pickled(key)
+            if pickled is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(pickled) + delta
+            expiry = self._entries[key][0]
+            self._delete(key)
+            self._store(key, expiry, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._delete(key)
+
+    def _get_pickled(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expiry, pickled = entry
+        if expiry is not None and expiry <= time.monotonic():
+            self._delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return pickled
+
+    def _set_pickled(self, key, pickled, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self._default_timeout
+        self._delete(key)
+        if len(pickled) <= self._max_size:
+            self._store(key, None if timeout is None else time.monotonic() + timeout, pickled)
+
+    def _store(self, key, expiry, pickled):
+        self._entries[key] = (expiry, pickled)
+        self._size += len(pickled)
+        while len(self._entries) > self._max_entries or self._size > self._max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)   # least recently used entry
+            self._size -= len(evicted)
+
+    def _delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+def get_data_tab_cache():
+    """
+    Get the cache for the session data monitor: the cache "otreeutils" if it is configured in the `CACHES` setting,
+    otherwise a local-memory cache with at most 200 entries and a total size of at most 64 MB (the least recently used
+    entries are evicted). The local-memory cache is only shared within a single server process.
+    """
+    global _data_tab_locmem_cache
 
-        # sanitize each value
-        df = df.applymap(sanitize_pdvalue_for_live_update)\
-            .rename(columns={'group.id_in_subsession': 'player.group'})[all_colnames]
+    if _DATA_TAB_CACHE_ALIAS in settings.CACHES:
+        return caches[_DATA_TAB_CACHE_ALIAS]
 
-        yield df.to_dict(orient='split')['data']
+    if _data_tab_locmem_cache is None:
+        _data_tab_locmem_cache = _BoundedLocalCache(_DATA_TAB_LOCMEM_MAX_ENTRIES, _DATA_TAB_LOCMEM_MAX_SIZE,
+                                                    default_timeout=_DATA_TAB_CACHE_TIMEOUT)
+    return _data_tab_locmem_cache
 
 
-def get_rows_for_custom_export(app_name):
+def get_shared_rows_for_data_tab(session, app_name, round_number, expand_custom_models=False, fingerprint=None):
+    """
+    Get the rows of the table for round `round_number` of app `app_name` in the session data monitor for `session`
+    (as from `get_rows_for_data_tab_app()` with `expand_custom_models`) or None if this round doesn't exist. The rows
+    are cached for a short time under the current data fingerprint of the session (see
+    `get_session_data_fingerprint()`), i.e. they're shared between concurrent viewers and invalidated as soon as the
+    data is modified. If the `fingerprint` was already computed for the current request, it can be passed.
+
+    The rows are computed only once at a time ("single-flight"): while one viewer computes them, the others wait for
+    the result, but at most `_DATA_TAB_LOCK_WAIT` seconds; after that they compute the rows themselves.
+    """
+    if fingerprint is None:
+        fingerprint = get_session_data_fingerprint(session)
+
+    data_tab_cache = get_data_tab_cache()
+    key = 'otreeutils.data_tab_rows.%s.%s.%d.%s.%s' % (session.code, app_name, round_number,
+                                                       'expanded' if expand_custom_models else 'aggregated',
+                                                       fingerprint)
+    lock_key = key + '.lock'
+
+    # cached value is a tuple with the rows or None for a non-existent round
+    cached = data_tab_cache.get(key)
+    locked = False
+    deadline = time.monotonic() + _DATA_TAB_LOCK_WAIT
+    while cached is None:
+        locked = data_tab_cache.add(lock_key, True, _DATA_TAB_LOCK_TIMEOUT)
+        if locked or time.monotonic() > deadline:   # compute the rows here
+            break
+
+        time.sleep(0.05)   # wait for the viewer that computes the rows
+        cached = data_tab_cache.get(key)
+
+    if cached is not None:
+        return cached[0]
+
+    try:
+        rows = next(get_rows_for_data_tab_app(session, app_name, round_number=round_number,
+                                              expand_custom_models=expand_custom_models), None)
+        data_tab_cache.set(key, (rows, ), _DATA_TAB_ROWS_TIMEOUT)
+    finally:
+        if locked:
+            data_tab_cache.delete(lock_key)
+
+    return rows
+
+
+def _data_tab_cache_key(session, table_hash):
+    """Key for caching the rows of a table in the session data monitor."""
+    return 'otreeutils.data_tab.%s.%s' % (session.code, table_hash)
+
+
+def get_rows_for_custom_export(app_name, **session_filter):
     """
     Provide data rows for custom export function of an app. Used in default custom export function
-    `otreeutils.admin_extensions.custom_export`.
+    `otreeutils.admin_extensions.custom_export`. Sessions can be filtered via `session_filter` keyword arguments as
+    accepted by `get_session_ids_for_export()`.
     """
 
-    models_module = get_models_module(app_name)
-    Player = models_module.Player
-    Group = models_module.Group
-    Subsession = models_module.Subsession
+    df = get_dataframe_for_custom_export(app_name, **session_filter)
 
-    # find out column names for standard models
-    std_models_colnames = {m.__name__.lower(): export.get_fields_for_csv(m)
-                           for m in (Session, Subsession, Group, Player, Participant)}
-    std_models_colnames['player'].append('participant_id')
+    # sanitize each value
+    split_data = sanitize_dataframe_for_csv(df).to_dict(orient='split')
 
-    # get custom model configuration, if there is any
-    custom_models_conf = get_custom_models_conf(models_module, for_action='data_view')
+    yield split_data['columns']
+    for row in split_data['data']:
+        yield row
+
+
+def get_dataframe_for_custom_export(app_name, **session_filter):
+    """
+    Create a dataframe with the joined data from standard and custom models of app `app_name` as used for the
+    custom export (see `get_rows_for_custom_export()`). The values are not sanitized. Sessions can be filtered via
+    `session_filter` keyword arguments as accepted by `get_session_ids_for_export()`.
+    """
 
-    # find out column names for custom models
-    custom_models_colnames = get_custom_models_columns(custom_models_conf, for_action='data_view')
+    plan = get_export_plan(app_name, 'data_view')
+    Player = plan.Player
+    Group = plan.Group
+    Subsession = plan.Subsession
 
-    # identify links between standard and custom models
-    links_to_custom_models = get_links_between_std_and_custom_models(custom_models_conf, for_action='data_view')
+    # column names for standard models (the plan's lists are not modified)
+    std_models_colnames = dict(plan.std_models_colnames)
+    std_models_colnames['player'] = std_models_colnames['player'] + ['participant_id']
+
+    # column names for custom models
+    custom_models_colnames = plan.custom_models_colnames
+
+    # links between standard and custom models
+    links_to_custom_models = plan.links_to_custom_models
 
     # define querysets for standard models and their links for merging as left index, right index
     # the order is important!
 
     # create lists of IDs that will be used for the export
-    participant_ids = set(Player.objects.values_list('participant_id', flat=True))
-    session_ids = set(Subsession.objects.values_list('session_id', flat=True))
+    session_ids = get_session_ids_for_export(Subsession, **session_filter)
 
     filter_in_sess = {'session_id__in': session_ids}
 
@@ -664,19 +1701,321 @@ def get_rows_for_custom_export(app_name):
         (Subsession, Subsession.objects.filter(**filter_in_sess), ('session.id', 'subsession.session_id')),
         (Group, Group.objects.filter(**filter_in_sess), ('subsession.id', 'group.subsession_id')),
         (Player, Player.objects.filter(**filter_in_sess), ('group.id', 'player.group_id')),
-        (Participant, Participant.objects.filter(id__in=participant_ids), ('player.participant_id', 'participant.id')),
+        (Participant, Participant.objects.filter(**filter_in_sess), ('player.participant_id', 'participant.id')),
     )
 
-    # create a dataframe for this subsession's complete data incl. custom models data
-    df = get_dataframe_from_linked_models(std_models_querysets, links_to_custom_models,
-                                          std_models_colnames, custom_models_colnames)
+    # create a dataframe for the complete data incl. custom models data
+    return get_dataframe_from_linked_models(std_models_querysets, links_to_custom_models,
+                                            std_models_colnames, custom_models_colnames)
 
-    # sanitize each value
-    split_data = df.applymap(sanitize_pdvalue_for_csv).to_dict(orient='split')
 
-    yield split_data['columns']
-    for row in split_data['data']:
-        yield row
+def save_custom_export_as_columnar_file(app_name, path, file_format='parquet', per_model=False, **session_filter):
+    """
+    Write the joined data from standard and custom models of app `app_name` (see `get_dataframe_for_custom_export()`)
+    to a columnar data file at `path` in `file_format` "parquet" or "feather". Other than the CSV export, the columns
+    retain their data types (e.g. integers, booleans, currency values as floats). This requires the package "pyarrow".
+
+    If `per_model` is True, `path` is a directory and one file `<model name>.<file_format>` is written per model
+    with the normalized data from `get_normalized_dataframes_for_app()`.
+
+    Sessions can be filtered via `session_filter` keyword arguments as accepted by `get_session_ids_for_export()`.
+    Returns a list of paths to the written files.
+    """
+    if file_format not in ('parquet', 'feather'):
+        raise ValueError('`file_format` must be either "parquet" or "feather"')
+
+    if per_model:
+        os.makedirs(path, exist_ok=True)
+        dfs = get_normalized_dataframes_for_app(app_name, typed=True, **session_filter)
+        paths = [os.path.join(path, '%s.%s' % (model_name, file_format)) for model_name in dfs.keys()]
+    else:
+        plan = get_export_plan(app_name, 'data_view')
+
+        # models per column prefix for determining the data types
+        models_per_prefix = {m.__name__.lower(): m for m in (Session, plan.Subsession, plan.Group, plan.Player,
+                                                             Participant)}
+        models_per_prefix.update({name.lower(): conf['class'] for name, conf in plan.custom_models_conf.items()})
+
+        df = get_typed_dataframe(get_dataframe_for_custom_export(app_name, **session_filter), models_per_prefix)
+        dfs = {None: df}
+        paths = [path]
+
+    for df_out, df_path in zip(dfs.values(), paths):
+        df_out = df_out.reset_index(drop=True)   # feather only supports a default index
+
+        if file_format == 'parquet':
+            df_out.to_parquet(df_path, index=False)
+        else:
+            df_out.to_feather(df_path)
+
+    return paths
+
+
+def get_typed_dataframe(df, models_per_prefix):
+    """
+    Convert the columns in dataframe `df` to data types that match the fields of the respective models. Columns are
+    named `<model name>.<field name>` and `models_per_prefix` maps lowercase model names to model classes. Integer
+    fields are converted to nullable integers, boolean fields to nullable booleans and decimal (incl. currency) fields
+    to floats. Other columns are not changed. Returns a new dataframe.
+    """
+    dtypes = {}
+    for col in df.columns:
+        model_name, _, field_name = col.partition('.')
+        model = models_per_prefix.get(model_name)
+        if model is None:
+            continue
+
+        dtype = _columnar_dtype_for_field(model, field_name)
+        if dtype is not None:
+            dtypes[col] = dtype
+
+    return df.astype(dtypes)
+
+
+def _columnar_dtype_for_field(model, field_name):
+    """Get the data type for columnar data export of field `field_name` in `model` or None if there's no such field."""
+    field = _get_model_field_or_none(model, field_name)
+    if field is None:
+        return None
+
+    return _COLUMNAR_DTYPES_FOR_FIELD_TYPES.get(field.get_internal_type())
+
+
+#%% incremental data export
+
+
+def get_model_tables_for_app(app_name, for_action='export_data', include_session=False, **session_filter):
+    """
+    Define a table for each model of app `app_name`: participants, subsessions, groups, players and the custom models
+    configured for `for_action` (`data_view` or `export_data`). If `include_session` is True, a table for the
+    sessions is added as first table. Sessions can be filtered via `session_filter` keyword arguments as accepted by
+    `get_session_ids_for_export()`.
+
+    Returns an OrderedDict with `model name -> (model class, column names, queryset)`. The first column is always
+    "id", followed by the ID columns that link to other tables.
+    """
+    plan = get_export_plan(app_name, for_action)
+    Player = plan.Player
+    Group = plan.Group
+    Subsession = plan.Subsession
+
+    session_ids = get_session_ids_for_export(Subsession, **session_filter)
+    filter_in_sess = {'session_id__in': session_ids}
+
+    std_models_links = (
+        (Participant, ['session_id']),
+        (Subsession, ['session_id']),
+        (Group, ['subsession_id']),
+        (Player, ['group_id', 'participant_id']),
+    )
+
+    tables = OrderedDict()
+
+    if include_session:
+        columns = ['id'] + [c for c in plan.std_models_colnames['session'] if c != 'id']
+        tables['session'] = (Session, columns, Session.objects.filter(id__in=session_ids))
+
+    for smodel, link_columns in std_models_links:
+        smodel_name_lwr = smodel.__name__.lower()
+        columns = ['id'] + link_columns + [c for c in plan.std_models_colnames[smodel_name_lwr]
+                                           if c != 'id' and c not in link_columns]
+        tables[smodel_name_lwr] = (smodel, columns, smodel.objects.filter(**filter_in_sess))
+
+    custom_models_conf = plan.custom_models_conf
+    custom_models_colnames = plan.custom_models_colnames
+
+    for cmodel_name, conf in custom_models_conf.items():
+        cmodel = conf['class']
+        cmodel_name_lwr = cmodel_name.lower()
+        link_with = conf[for_action]['link_with']
+        link_columns = [link_with + '_id']
+        columns = ['id'] + link_columns + [c for c in custom_models_colnames[cmodel_name_lwr]
+                                           if c != 'id' and c not in link_columns]
+        session_lookup = _session_lookup_for_custom_model(cmodel, custom_models_conf, for_action)
+        qs = cmodel.objects.filter(**{session_lookup + '__in': session_ids})
+        tables[cmodel_name_lwr] = (cmodel, columns, qs)
+
+    return tables
+
+
+def get_export_delta(app_name, manifest=None, **session_filter):
+    """
+    Export only the rows of app `app_name` that are new or have changed since the export that produced `manifest`
+    (a dict as returned by this function; if `manifest` is None, all rows are exported). The rows are exported per
+    model as defined in `get_model_tables_for_app()`. Sessions can be filtered via `session_filter` keyword arguments
+    as accepted by `get_session_ids_for_export()`; use the same filters for all exports of a series of deltas.
+
+    For each model, the manifest records the highest row ID and a digest for each exported row. Rows whose digests
+    differ from the recorded ones are exported as changed. Custom models can define a modification timestamp field
+    as `modified_field` in their `export_data` configuration. For these models, only rows with a higher ID or a
+    modification time at or after the latest one recorded in the manifest are fetched from the database. Rows with the
+    same modification time as recorded may have been modified after the previous export (timestamps have limited
+    resolution), so they're fetched again and only exported if their digest changed.
+
+    Note that the manifest contains a digest for every exported row of every model, so its size grows linearly with
+    the number of rows (about 30 bytes per row) and it is rewritten in full with each delta.
+
+    Returns a tuple `(delta, new manifest)`. `delta` is an OrderedDict with `model name -> table`, where each table is
+    a dict with the list of `columns`, the list of new or changed `rows` and the list of IDs of `deleted` rows.
+    Use `merge_export_deltas()` to combine a series of deltas into the complete data.
+    """
+    custom_models_conf = get_export_plan(app_name, 'export_data').custom_models_conf
+    modified_fields = {name.lower(): conf['export_data'].get('modified_field')
+                       for name, conf in custom_models_conf.items()}
+
+    prev_models_manifest = manifest['models'] if manifest else {}
+    delta = OrderedDict()
+    new_manifest = {'app': app_name, 'models': OrderedDict()}
+
+    for model_name, (model, columns, qs) in get_model_tables_for_app(app_name, **session_filter).items():
+        prev_model_manifest = prev_models_manifest.get(model_name, {})
+        prev_digests = prev_model_manifest.get('digests', {})
+        prev_max_id = prev_model_manifest.get('max_id')
+        prev_max_modified = prev_model_manifest.get('max_modified')
+        modified_field = modified_fields.get(model_name)
+
+        current_ids = set(qs.values_list('id', flat=True))
+        digests = {row_id: d for row_id, d in prev_digests.items() if int(row_id) in current_ids}
+
+        qs_rows = qs
+        if modified_field and prev_max_id is not None:
+            # fetch only rows that are new or were modified since the previous export; rows modified in the same
+            # timestamp tick as the previous maximum are fetched again and filtered by their digest below
+            since_prev = Q(id__gt=prev_max_id)
+            if prev_max_modified is not None:
+                since_prev |= Q(**{modified_field + '__gte': prev_max_modified})
+            qs_rows = qs_rows.filter(since_prev)
+
+        rows = []
+        for row_values in qs_rows.order_by('id').values_list(*_db_field_names(model, columns)):
+            row = [export.sanitize_for_csv(v) for v in row_values]
+            row_id = str(row[0])
+            row_digest = _data_digest(row)
+            if digests.get(row_id) != row_digest:
+                rows.append(row)
+                digests[row_id] = row_digest
+
+        delta[model_name] = {
+            'columns': columns,
+            'rows': rows,
+            'deleted': sorted(int(row_id) for row_id in prev_digests.keys() if int(row_id) not in current_ids)
+        }
+
+        model_manifest = {
+            'max_id': max(current_ids) if current_ids else prev_max_id,
+            'digests': digests,
+        }
+        if modified_field:
+            max_modified = qs.aggregate(max_modified=Max(modified_field))['max_modified']
+            model_manifest['max_modified'] = max_modified.isoformat() if max_modified else prev_max_modified
+
+        new_manifest['models'][model_name] = model_manifest
+
+    return delta, new_manifest
+
+
+def _session_lookup_for_custom_model(cmodel, custom_models_conf, for_action):
+    """
+    Get the field lookup for the session ID of custom model `cmodel`, following the chain of links via other custom
+    models in `custom_models_conf` up to the standard model, e.g. "fruit__seller__session_id".
+    """
+    custom_models = {conf['class']: conf for conf in custom_models_conf.values()}
+    lookup = []
+    model = cmodel
+    while model in custom_models:
+        link_with = custom_models[model][for_action]['link_with']
+        lookup.append(link_with)
+        model = getattr(model, link_with).field.related_model
+
+        if len(lookup) > len(custom_models):
+            raise ValueError('custom model links of %s form a cycle' % cmodel.__name__)
+
+    return '__'.join(lookup + ['session_id'])
+
+
+def merge_export_deltas(deltas):
+    """
+    Merge a sequence of `deltas` as returned from `get_export_delta()` (the first being the full export created
+    without manifest) into the complete data. Returns an OrderedDict with `model name -> table` in the same format as
+    the deltas (without deleted rows and rows sorted by ID).
+    """
+    merged_rows = OrderedDict()
+    merged_columns = {}
+
+    for delta in deltas:
+        for model_name, table in delta.items():
+            rows_per_id = merged_rows.setdefault(model_name, {})
+            merged_columns[model_name] = table['columns']
+
+            for row_id in table['deleted']:
+                rows_per_id.pop(row_id, None)
+
+            for row in table['rows']:
+                rows_per_id[row[0]] = row
+
+    return OrderedDict((model_name, {
+        'columns': merged_columns[model_name],
+        'rows': [rows_per_id[row_id] for row_id in sorted(rows_per_id.keys())],
+        'deleted': []
+    }) for model_name, rows_per_id in merged_rows.items())
+
+
+def _data_digest(data):
+    """Create a short digest of the JSON serializable `data` (e.g. a row) for detecting changed data."""
+    data_json = json.dumps(data, cls=DjangoJSONEncoder)
+    return hashlib.blake2b(data_json.encode('utf-8'), digest_size=8).hexdigest()
+
+
+#%% normalized data export
+
+
+def get_normalized_dataframes_for_app(app_name, for_action='data_view', typed=False, **session_filter):
+    """
+    Create one dataframe per model of app `app_name` with the sessions, participants, subsessions, groups, players
+    and the custom models configured for `for_action` (`data_view` or `export_data`). Other than the joined data from
+    `get_dataframe_for_custom_export()`, the rows of custom models that are linked to the same standard model are not
+    combined with each other, so the size of the output grows only linearly with the number of rows in the database.
+    The tables are linked via their ID columns (e.g. "group_id" in the player table refers to "id" in the group
+    table).
+
+    If `typed` is True, the columns are converted to data types that match the model fields (see
+    `get_typed_dataframe()`), otherwise the values are not sanitized. Sessions can be filtered via `session_filter`
+    keyword arguments as accepted by `get_session_ids_for_export()`.
+
+    Returns an OrderedDict with `model name -> dataframe`.
+    """
+    tables = get_model_tables_for_app(app_name, for_action=for_action, include_session=True, **session_filter)
+
+    dfs = OrderedDict()
+    for model_name, (model, columns, qs) in tables.items():
+        df = _dataframe_from_queryset(qs.order_by('id'), model, columns)
+
+        if typed:
+            df = df.astype({c: dtype for c, dtype in ((c, _columnar_dtype_for_field(model, c)) for c in columns)
+                            if dtype is not None})
+
+        dfs[model_name] = df
+
+    return dfs
+
+
+def get_long_dataframe_from_normalized(dfs):
+    """
+    Convert the normalized dataframes `dfs` from `get_normalized_dataframes_for_app()` to a single dataframe in "long"
+    (tidy) format with the columns "model", "id", "field" and "value", i.e. one row per model instance and field.
+    The rows are ordered by model, ID and field in the order of the columns of each model's dataframe.
+    """
+    long_dfs = []
+    for model_name, df in dfs.items():
+        df_long = df.astype(object).melt(id_vars=['id'], var_name='field', value_name='value')
+        df_long = df_long.sort_values('id', kind='mergesort')   # stable sort retains order of fields
+        df_long.insert(0, 'model', model_name)
+        long_dfs.append(df_long)
+
+    if long_dfs:
+        return pd.concat(long_dfs, ignore_index=True)
+    else:
+        return pd.DataFrame(OrderedDict((c, []) for c in ('model', 'id', 'field', 'value')))
 
 
 class SessionDataExtension(SessionData):
@@ -695,22 +2034,19 @@ class SessionDataExtension(SessionData):
         app_names_by_subsession = []
         round_numbers_by_subsession = []
         for app_name in session.config['app_sequence']:
-            models_module = get_models_module(app_name)
-            num_rounds = models_module.Subsession.objects.filter(
+            plan = get_export_plan(app_name, 'data_view')
+            num_rounds = plan.Subsession.objects.filter(
                 session=session
             ).count()
 
-            custom_models_conf = get_custom_models_conf(models_module, for_action='data_view')
-
-            # find out column names for custom models
-            custom_models_colnames = get_custom_models_columns(custom_models_conf, for_action='data_view')
-
-            pfields, gfields, sfields = export.get_fields_for_data_tab(app_name)
-            gfields = [c for c in gfields if c != 'id_in_subsession']
-            std_models_colnames = dict(zip(('player', 'group', 'subsession'), (pfields, gfields, sfields)))
+            # column names for custom and standard models
+            custom_models_colnames = plan.data_tab_custom_models_colnames
+            pfields = plan.data_tab_colnames['player']
+            gfields = [c for c in plan.data_tab_colnames['group'] if c != 'id_in_subsession']
+            sfields = plan.data_tab_colnames['subsession']
 
             # all displayed columns in their order
-            field_headers[app_name] = combine_column_names(std_models_colnames, custom_models_colnames)
+            field_headers[app_name] = plan.data_tab_columns
 
             for round_number in range(1, num_rounds + 1):
                 table = dict(pfields=pfields, cfields=custom_models_colnames, gfields=gfields, sfields=sfields)
@@ -724,6 +2060,9 @@ class SessionDataExtension(SessionData):
             field_headers_json=json.dumps(field_headers),
             app_names_by_subsession=app_names_by_subsession,
             round_numbers_by_subsession=round_numbers_by_subsession,
+            # push updates via WebSockets if otreeutils' WebSocket routes are loaded
+            push_updates='otreeutils' in getattr(settings, 'EXTENSION_APPS', []),
+            page_size=_DATA_TAB_PAGE_SIZE,
         )
 
     def get_template_names(self):
@@ -733,16 +2072,89 @@ class SessionDataExtension(SessionData):
             return ['otree/admin/SessionData.html']
 
 
+def _session_data_etag(request, code):
+    """
+    ETag for the response of `SessionDataAjaxExtension`, made of the fingerprint of the session's data and the
+    request parameters. Returns None for an unknown session.
+
+    The fingerprint is stored in the request, so that it is computed only once per request.
+    """
+    try:
+        session = Session.objects.get(code=code)
+    except Session.DoesNotExist:
+        return None
+
+    request.otreeutils_data_fingerprint = get_session_data_fingerprint(session)
+    return _data_digest([request.otreeutils_data_fingerprint, sorted(request.GET.lists())])
+
+
+class SessionDataAggregates(AdminSessionPageMixin, vanilla.TemplateView):
+    """
+    Extension to oTree's live session data viewer: Aggregates of the session data computed in the database (see
+    `get_session_aggregates()`).
+    """
+    def vars_for_template(self):
+        return dict(aggregates=get_session_aggregates(self.session))
+
+    def get_template_names(self):
+        return ['otreeutils/admin/SessionDataAggregates.html']
+
+
 class SessionDataAjaxExtension(SessionDataAjax):
     """
     Extension to oTree's live session data viewer: Asynchronous JSON data provider.
+
+    Responses carry an ETag derived from `get_session_data_fingerprint()`. When the browser revalidates its cached
+    response via `If-None-Match` and the data was not modified, a "304 Not Modified" response is sent without
+    fetching and joining the data.
     """
 
+    @method_decorator(condition(etag_func=_session_data_etag))
     def get(self, request, code):
+        response = self._get(request, code)
+        patch_cache_control(response, private=True, no_cache=True)   # browser must always revalidate
+        return response
+
+    def _get(self, request, code):
         session = get_object_or_404(Session, code=code)
 
         if get_custom_models_conf_per_app(session):
-            rows = list(get_rows_for_data_tab(session))
-            return JsonResponse(rows, safe=False)
+            if request.GET.get('v') == '2':   # protocol with updates only for changed tables
+                known_hashes = request.GET.get('hashes', '').split(',')
+
+                # optionally only provide the table for a single subsession
+                app_name = request.GET.get('app')
+                if app_name is None:
+                    round_number = None
+                else:
+                    if app_name not in session.config['app_sequence']:
+                        raise Http404('app "%s" is not part of this session' % app_name)
+                    try:
+                        round_number = int(request.GET['round'])
+                    except (KeyError, ValueError):
+                        return HttpResponseBadRequest('parameter "round" must be given as integer')
+
+                # optionally use the compact encoding of rows (see `encode_rows_compact()`)
+                compact = request.GET.get('format') == 'compact'
+
+                # show all rows of the custom models instead of aggregating them per player
+                expand_custom_models = request.GET.get('expand') == '1'
+
+                # page of rows
+                try:
+                    offset = max(0, int(request.GET.get('offset', 0)))
+                    limit = min(_DATA_TAB_MAX_PAGE_SIZE, max(1, int(request.GET.get('limit', _DATA_TAB_PAGE_SIZE))))
+                except ValueError:
+                    return HttpResponseBadRequest('parameters "offset" and "limit" must be given as integers')
+
+                return JsonResponse(get_data_tab_update(session, known_hashes, app_name=app_name,
+                                                        round_number=round_number, compact=compact,
+                                                        expand_custom_models=expand_custom_models,
+                                                        offset=offset, limit=limit,
+                                                        fingerprint=getattr(request, 'otreeutils_data_fingerprint',
+                                                                            None)))
+            else:                             # all rows of all tables
+                rows = list(get_rows_for_data_tab(session))
+                return JsonResponse(rows, safe=False)
         else:     # no custom models -> use default oTree method
             return super(SessionDataAjaxExtension, self).get(request, code)
@@ -0,0 +1,3 @@
+"""
+oTree extension hooks of otreeutils. Loaded by oTree when "otreeutils" is listed in `EXTENSION_APPS` in `settings.py`.
+"""
@@ -0,0 +1,12 @@
+"""
+WebSocket routes for pushing updates to the session data monitor of otreeutils' admin extensions.
+"""
+
+from django.conf.urls import url
+
+from otreeutils.admin_extensions.consumers import SessionDataConsumer
+
+
+websocket_routes = [
+    url(r'^otreeutils_session_data/(?P<code>[a-z0-9]+)/$', SessionDataConsumer),
+]
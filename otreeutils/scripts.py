@@ -14,6 +14,7 @@ import json
 
 # code to setup the oTree/Django environment (locate and load settings module, setup django)
 
+from django.conf import settings as django_settings
 from otree_startup import configure_settings, do_django_setup
 
 
@@ -25,11 +26,15 @@ if os.getcwd() not in sys.path:
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 DJANGO_SETTINGS_MODULE = os.environ['DJANGO_SETTINGS_MODULE']
 
-configure_settings(DJANGO_SETTINGS_MODULE)
-do_django_setup()
+# only set up if this module is not imported from within a running oTree/Django environment (e.g. from bot tests)
+if not django_settings.configured:
+    configure_settings(DJANGO_SETTINGS_MODULE)
+    do_django_setup()
 
 
-from .admin_extensions.views import get_hierarchical_data_for_apps
+from .admin_extensions.views import get_hierarchical_data_for_apps, iter_hierarchical_data_for_apps, \
+    save_custom_export_as_columnar_file, get_export_delta, merge_export_deltas, get_normalized_dataframes_for_app, \
+    get_long_dataframe_from_normalized
 
 
 def save_data_as_json_file(data, path, **kwargs):
@@ -37,3 +42,107 @@ def save_data_as_json_file(data, path, **kwargs):
 
     with open(path, 'w') as f:
         json.dump(data, f, cls=DjangoJSONEncoder, **kwargs)
+
+
+def save_data_as_json_stream(items, path, **kwargs):
+    """
+    Write `(key, value)` pairs from iterable `items` (e.g. from `iter_hierarchical_data_for_apps()`) as JSON object
+    to a file at `path`. See `write_data_as_json_stream()`.
+    """
+    with open(path, 'w') as f:
+        write_data_as_json_stream(items, f, **kwargs)
+
+
+def write_data_as_json_stream(items, f, **kwargs):
+    """
+    Write `(key, value)` pairs from iterable `items` as JSON object to file handle `f`. Each value is serialized and
+    written as soon as it is produced, so only a single value is held in memory at a time. Additional keyword
+    arguments like `indent` are passed to `json.dumps()`; the output is the same as with `json.dump()` for the
+    whole object.
+    """
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    kwargs.setdefault('cls', DjangoJSONEncoder)
+
+    indent = kwargs.get('indent')
+    if indent is not None and not isinstance(indent, str):
+        indent = ' ' * indent
+
+    if 'separators' in kwargs:
+        item_sep, key_sep = kwargs['separators']
+    else:
+        item_sep, key_sep = (', ', ': ') if indent is None else (',', ': ')
+
+    f.write('{')
+    empty = True
+    for key, value in items:
+        if not empty:
+            f.write(item_sep)
+
+        value_json = json.dumps(value, **kwargs)
+        if indent is not None:    # indent the whole nested value by one level
+            f.write('\n' + indent)
+            value_json = value_json.replace('\n', '\n' + indent)
+
+        f.write(json.dumps(key, ensure_ascii=kwargs.get('ensure_ascii', True)) + key_sep + value_json)
+        empty = False
+
+    if indent is not None and not empty:
+        f.write('\n')
+    f.write('}')
+
+
+def save_export_delta(app_name, path, manifest_path, **session_filter):
+    """
+    Write the rows of app `app_name` that are new or changed since the last export (see `get_export_delta()`) as JSON
+    to `path`. The manifest of the last export is loaded from `manifest_path` (if this file doesn't exist, all rows
+    are exported) and is then updated for the next export. Sessions can be filtered via `session_filter` keyword
+    arguments. Returns the delta.
+    """
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    else:
+        manifest = None
+
+    delta, new_manifest = get_export_delta(app_name, manifest, **session_filter)
+
+    save_data_as_json_file(delta, path)
+    save_data_as_json_file(new_manifest, manifest_path)
+
+    return delta
+
+
+def load_and_merge_export_deltas(paths):
+    """
+    Load the delta exports written with `save_export_delta()` from the JSON files at `paths` (in the order in which
+    they were created) and merge them into the complete data (see `merge_export_deltas()`).
+    """
+    deltas = []
+    for path in paths:
+        with open(path) as f:
+            deltas.append(json.load(f))
+
+    return merge_export_deltas(deltas)
+
+
+def save_normalized_data_as_csv_files(app_name, path, long_format=False, **session_filter):
+    """
+    Write the normalized data of app `app_name` (see `get_normalized_dataframes_for_app()`) as CSV files to the
+    directory `path`: one file `<model name>.csv` per model or, if `long_format` is True, a single file `long.csv` in
+    "long" format (see `get_long_dataframe_from_normalized()`). Sessions can be filtered via `session_filter` keyword
+    arguments. Returns a list of paths to the written files.
+    """
+    os.makedirs(path, exist_ok=True)
+
+    dfs = get_normalized_dataframes_for_app(app_name, **session_filter)
+    if long_format:
+        dfs = {'long': get_long_dataframe_from_normalized(dfs)}
+
+    paths = []
+    for name, df in dfs.items():
+        df_path = os.path.join(path, name + '.csv')
+        df.to_csv(df_path, index=False)
+        paths.append(df_path)
+
+    return paths
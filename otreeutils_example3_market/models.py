@@ -1,5 +1,5 @@
 """
-Model definitions including "custom data models" `FruitOffer` and `Purchase`.
+Model definitions including "custom data models" `FruitOffer`, `Purchase` and `Restock`.
 
 March 2021, Markus Konrad <markus.konrad@wzb.eu>
 """
@@ -59,6 +59,18 @@ class Player(BasePlayer):
         else:
             return 'seller'
 
+    class CustomModelConf:
+        """
+        Configuration for otreeutils admin extensions.
+        Standard models can only define aggregates for the session data monitor.
+        """
+        data_view = {
+            'aggregates': [
+                {'name': 'average balance per round', 'function': 'avg', 'field': 'balance',
+                 'group_by': ['round_number']},
+            ]
+        }
+
 
 class FruitOffer(Model):
     """
@@ -98,7 +110,11 @@ class FruitOffer(Model):
         """
         data_view = {
             'exclude_fields': ['seller_id'],
-            'link_with': 'seller'
+            'link_with': 'seller',
+            'aggregates': [
+                {'name': 'offers per kind', 'function': 'count', 'group_by': ['kind']},
+                {'name': 'offered amount per kind', 'function': 'sum', 'field': 'amount', 'group_by': ['kind']},
+            ]
         }
         export_data = {
             'exclude_fields': ['seller_id'],
@@ -132,9 +148,42 @@ class Purchase(Model):
         """
         data_view = {
             'exclude_fields': ['buyer_id'],
-            'link_with': 'buyer'
+            'link_with': 'buyer',
+            'aggregates': [
+                {'name': 'purchased amount per kind', 'function': 'sum', 'field': 'amount',
+                 'group_by': ['fruit__kind']},
+            ]
         }
         export_data = {
             'exclude_fields': ['buyer_id'],
             'link_with': 'buyer'
-        }
\ No newline at end of file
+        }
+
+
+class Restock(Model):
+    """
+    Custom data model derived from Django's generic `Model` class. This class records that a seller added more fruit
+    to an existing offer. It stores a reference to the offer via a `ForeignKey` to `FruitOffer` and the amount of fruit
+    that was added.
+
+    This model is linked to another custom model (`FruitOffer`), which in turn is linked to `Player`.
+    """
+
+    amount = models.IntegerField(min=1)    # fruits added to the offer
+
+    offer = ForeignKey(FruitOffer, on_delete=models.CASCADE)     # creates many-to-one relation -> an offer can be
+                                                                 # restocked several times
+
+    class CustomModelConf:
+        """
+        Configuration for otreeutils admin extensions.
+        This class and its attributes must be existent in order to include this model in the data viewer / data export.
+        """
+        data_view = {
+            'exclude_fields': ['offer_id'],
+            'link_with': 'offer'
+        }
+        export_data = {
+            'exclude_fields': ['offer_id'],
+            'link_with': 'offer'
+        }
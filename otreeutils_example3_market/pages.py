@@ -7,7 +7,7 @@ March 2021, Markus Konrad <markus.konrad@wzb.eu>
 
 from otree.api import Currency as c, currency_range
 from ._builtin import Page, WaitPage
-from .models import Constants, FruitOffer, Purchase
+from .models import Constants, FruitOffer, Purchase, Restock
 from django.forms import modelformset_factory, ModelForm, IntegerField, HiddenInput
 
 
@@ -94,6 +94,9 @@ class CreateOffersPage(Page):
                     if changed_offer.amount > 0:
                         changed_offer.save()    # save existing offer (update)
                         cost += new_amount * FruitOffer.PURCHASE_PRICES[changed_offer.kind]   # update total cost
+
+                        if new_amount > 0:      # record that fruit was added to the existing offer
+                            Restock.objects.create(offer=changed_offer, amount=new_amount)
                     else:
                         changed_offer.delete()  # offers that dropped to amount zero will be removed
                 elif form.cleaned_data.get('amount', 0) > 0:    # create new offer
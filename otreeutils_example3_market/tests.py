@@ -4,12 +4,65 @@ Automated tests for the experiment.
 July 2018, Markus Konrad <markus.konrad@wzb.eu>
 """
 
+import asyncio
+import io
+import json
+import multiprocessing
+import os
 import random
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
 from otree.api import Currency as c, currency_range, Submission
-from . import pages
+from otreeutils.admin_extensions.views import get_hierarchical_data_for_app, get_custom_models_conf, \
+    get_hierarchical_data_for_apps, iter_hierarchical_data_for_apps, get_session_ids_for_export, \
+    get_dataframe_for_custom_export, get_rows_for_data_tab_app, get_session_data_fingerprint, \
+    get_shared_rows_for_data_tab, get_aggregates_conf, get_session_aggregates, get_export_delta, merge_export_deltas
+from otreeutils.admin_extensions.views import save_custom_export_as_columnar_file, \
+    get_normalized_dataframes_for_app, get_long_dataframe_from_normalized, get_rows_for_data_tab, get_export_plan, \
+    join_dataframes, get_data_tab_update, encode_rows_compact, SessionDataAjaxExtension, \
+    _BoundedLocalCache, sanitize_pdvalue_for_live_update, sanitize_pdvalue_for_csv, \
+    sanitize_dataframe_for_live_update, sanitize_dataframe_for_csv
+from otreeutils.admin_extensions import signals
+from otreeutils.admin_extensions.consumers import SessionDataConsumer
+from otreeutils.scripts import write_data_as_json_stream
+from . import pages, models
 from ._builtin import Bot
-from .models import Constants, FruitOffer, Purchase
+from .models import Constants, FruitOffer, Purchase, Restock
+
+
+try:
+    import pyarrow   # optional dependency for columnar data export
+except ImportError:
+    pyarrow = None
+
+
+def _decode_rows_compact(encoded):
+    # Python version of `decodeRowsCompact()` in the session data monitor's JavaScript
+    columns = []
+    for col in encoded['columns']:
+        if 'c' in col:
+            values = [col['c']] * encoded['n_rows']
+        elif 'r' in col:
+            values = [v for v, n in zip(col['r'], col['n']) for _ in range(n)]
+        elif 'd' in col:
+            values = [col['d'][i] for i in col['i']]
+        else:
+            values = col['v']
+        columns.append(values)
+
+    return [list(row) for row in zip(*columns)]
 
 
 def _fill_submitdata(submitdata, objs, i):
@@ -54,6 +107,8 @@ class PlayerBot(Bot):
 
                 if prev_offer is None:
                     offer['kind'] = random.choice(FruitOffer.KINDS)[0]
+            elif i == 0:    # always restock the first existing offer so that `Restock` objects are created
+                offer.update(rand_data, amount=random.randint(1, 10))
 
             _fill_submitdata(submitdata, offer, i)
 
@@ -173,6 +228,497 @@ class PlayerBot(Bot):
 
             assert self.player.balance == self.player.initial_balance - cost
 
+    def _check_export_query_budget(self):
+        # the hierarchical export must use a fixed number of queries, independent of the number of players:
+        # session IDs, sessions, subsessions, groups, players, participants + one query per custom model
+        n_custom_models = len(get_custom_models_conf(models, for_action='export_data'))
+        app_name = self.player._meta.app_config.name
+
+        with CaptureQueriesContext(connection) as queries:
+            get_hierarchical_data_for_app(app_name)
+
+        assert len(queries.captured_queries) == 6 + n_custom_models,\
+            'hierarchical export exceeded its query budget'
+
+    def _check_export_participant_vars_options(self):
+        # excluding, selecting or moving participant vars to a side table must not add queries
+        n_custom_models = len(get_custom_models_conf(models, for_action='export_data'))
+        app_name = self.player._meta.app_config.name
+
+        for options in (dict(participant_vars=False),
+                        dict(participant_vars=['nonexistent_key']),
+                        dict(participant_vars_side_table=True)):
+            with CaptureQueriesContext(connection) as queries:
+                data = get_hierarchical_data_for_app(app_name, **options)
+
+            assert len(queries.captured_queries) == 6 + n_custom_models,\
+                'hierarchical export with %s exceeded its query budget' % options
+
+            sess = data[0]
+            participant = sess['__subsession'][0]['__group'][0]['__player'][0]['__participant']
+            if options.get('participant_vars') is False:
+                assert 'vars' not in participant and '__participant_vars' not in sess
+            elif options.get('participant_vars_side_table'):
+                assert 'vars' not in participant
+                assert participant['code'] in sess['__participant_vars']
+            else:
+                assert participant['vars'] == {}
+
+    def _check_bounded_local_cache(self):
+        # the default cache of the live data view evicts the least recently used entries when it is full
+        cache = _BoundedLocalCache(max_entries=2, max_size=1000, default_timeout=600)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)      # evicts "b", which is used less recently than "a"
+        assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 3}
+
+        assert not cache.add('a', 10) and cache.add('b', 20) and cache.incr('b') == 21
+        cache.set('c', 'x' * 2000)   # too large to be kept
+        assert cache.get('c') is None and cache.get('b') == 21
+
+        cache.set('d', 4, timeout=0)   # expires immediately
+        assert cache.get('d') is None
+
+    def _check_data_tab_query_budget(self):
+        # the live data view must use a fixed number of queries per app, independent of the number of rounds:
+        # subsession IDs, subsessions, groups, players + one query per custom model
+        n_custom_models = len(get_custom_models_conf(models, for_action='data_view'))
+        session = self.session
+        app_name = self.player._meta.app_config.name
+
+        with CaptureQueriesContext(connection) as queries:
+            tables = list(get_rows_for_data_tab_app(session, app_name))
+
+        assert len(tables) == Constants.num_rounds
+        assert len(queries.captured_queries) == 4 + n_custom_models,\
+            'live data view exceeded its query budget'
+
+    def _check_data_fingerprint(self):
+        # the fingerprint of the session data must only change when the data is modified
+        session = self.session
+        fingerprint = get_session_data_fingerprint(session)
+        assert get_session_data_fingerprint(session) == fingerprint
+
+        # oTree only saves modified fields, so a field must actually change
+        player = self.player
+        player.balance += 1
+        player.save()
+        assert get_session_data_fingerprint(session) != fingerprint, 'modification not detected by fingerprint'
+
+        player.balance -= 1
+        player.save()
+
+    def _check_shared_data_tab_rows(self):
+        # rows of the live data view are computed once and then shared until the data is modified
+        session = self.session
+        round_number = self.round_number
+        app_name = self.player._meta.app_config.name
+        rows = get_shared_rows_for_data_tab(session, app_name, round_number)
+
+        with CaptureQueriesContext(connection) as fingerprint_queries:
+            get_session_data_fingerprint(session)
+
+        with CaptureQueriesContext(connection) as queries:
+            assert get_shared_rows_for_data_tab(session, app_name, round_number) == rows
+
+        assert len(queries.captured_queries) == len(fingerprint_queries.captured_queries),\
+            'rows of live data view were computed again instead of being shared'
+
+    def _check_data_tab_aggregation(self):
+        # by default, the live data view shows one row per player with the number of offers and purchases
+        app_name = self.player._meta.app_config.name
+        aggregated_rows = next(get_rows_for_data_tab_app(self.session, app_name, round_number=self.round_number))
+        expanded_rows = next(get_rows_for_data_tab_app(self.session, app_name, round_number=self.round_number,
+                                                       expand_custom_models=True))
+
+        assert len(aggregated_rows) == len(self.subsession.get_players())
+        assert len(expanded_rows) >= len(aggregated_rows)
+
+        # the first version of the data protocol provides the expanded rows without the "_count" columns
+        count_indices = {i for i, col in enumerate(get_export_plan(app_name, 'data_view').data_tab_columns)
+                         if col.endswith('._count')}
+        expected_v1_rows = [[v for i, v in enumerate(row) if i not in count_indices] for row in expanded_rows]
+        assert expected_v1_rows in list(get_rows_for_data_tab(self.session))
+
+    def _check_session_aggregates(self):
+        # each aggregate of the live data view is computed with a single query
+        n_aggregates = 1 + len(get_aggregates_conf(models))   # participants per page + declared aggregates
+        session = self.session
+
+        with CaptureQueriesContext(connection) as queries:
+            aggregates = get_session_aggregates(session)
+
+        assert len(aggregates) == n_aggregates
+        assert len(queries.captured_queries) == n_aggregates, 'aggregates exceeded their query budget'
+
+        offers_per_kind = [a for a in aggregates if a['name'] == 'offers per kind'][0]
+        n_offers = FruitOffer.objects.filter(seller__session=self.session).count()
+        assert sum(int(row[-1]) for row in offers_per_kind['rows']) == n_offers
+
+    def _check_json_stream_export(self):
+        # streaming the sessions one by one must produce the same JSON as dumping the whole data at once
+        apps = self.session.config['app_sequence']
+        data = get_hierarchical_data_for_apps(apps)
+
+        for kwargs in ({}, {'indent': 2}):
+            f = io.StringIO()
+            write_data_as_json_stream(iter_hierarchical_data_for_apps(apps), f, **kwargs)
+            assert f.getvalue() == json.dumps(data, cls=DjangoJSONEncoder, **kwargs),\
+                'streamed JSON export differs from JSON dump with options %s' % kwargs
+
+    def _check_export_session_filters(self):
+        # session filters must select exactly the matching sessions
+        app_name = self.player._meta.app_config.name
+        session_id = self.session.id
+        tomorrow = timezone.now() + timedelta(days=1)
+
+        assert session_id in get_session_ids_for_export(models.Subsession)
+        assert get_session_ids_for_export(models.Subsession, session_codes=[self.session.code]) == {session_id}
+        assert get_session_ids_for_export(models.Subsession, session_codes=['nonexistent']) == set()
+        if self.session.label:   # labels are optional
+            assert get_session_ids_for_export(models.Subsession, session_ids=[session_id],
+                                              session_labels=[self.session.label]) == {session_id}
+        assert session_id in get_session_ids_for_export(models.Subsession, started_before=tomorrow)
+        assert get_session_ids_for_export(models.Subsession, started_after=tomorrow) == set()
+        assert (session_id in get_session_ids_for_export(models.Subsession, exclude_demo=True)) \
+            != self.session.is_demo
+
+        # the filters are applied to the exported data
+        data = get_hierarchical_data_for_app(app_name, session_codes=[self.session.code])
+        assert [sess['code'] for sess in data] == [self.session.code]
+        assert get_hierarchical_data_for_app(app_name, started_after=tomorrow) == []
+
+    def _check_chunked_export(self):
+        # fetching the rows in chunks must not change the exported data
+        app_name = self.player._meta.app_config.name
+        data = get_hierarchical_data_for_app(app_name)
+
+        for chunk_size in (1, 3, 1000):
+            assert get_hierarchical_data_for_app(app_name, chunk_size=chunk_size) == data,\
+                'hierarchical export with chunk size %d differs from unchunked export' % chunk_size
+
+        apps = self.session.config['app_sequence']
+        assert list(iter_hierarchical_data_for_apps(apps, chunk_size=3)) == list(iter_hierarchical_data_for_apps(apps))
+
+    def _check_parallel_export(self):
+        # fetching the apps in parallel processes must give the same result as fetching them one after another;
+        # child processes use their own database connections, so this is only possible if they can see the data
+        db_name = str(connection.settings_dict['NAME'])
+        if 'fork' not in multiprocessing.get_all_start_methods() or 'memory' in db_name \
+                or connection.in_atomic_block:
+            return
+
+        apps = self.session.config['app_sequence']
+        assert get_hierarchical_data_for_apps(apps, workers=2) == get_hierarchical_data_for_apps(apps),\
+            'parallel export differs from serial export'
+
+    def _check_columnar_export(self):
+        # columnar files must retain the data types of the model fields
+        if pyarrow is None:
+            return
+
+        app_name = self.player._meta.app_config.name
+        session_filter = dict(session_codes=[self.session.code])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'export.parquet')
+            assert save_custom_export_as_columnar_file(app_name, path, **session_filter) == [path]
+
+            df = pd.read_parquet(path)
+            assert len(df) == len(get_dataframe_for_custom_export(app_name, **session_filter))
+            assert str(df['player.id_in_group'].dtype) == 'Int64'
+            assert str(df['participant._is_bot'].dtype) == 'boolean'
+            assert str(df['player.balance'].dtype) == 'float64'
+            assert str(df['fruitoffer.price'].dtype) == 'float64'
+
+            # one file per model with the normalized data
+            model_dir = os.path.join(tmpdir, 'models')
+            paths = save_custom_export_as_columnar_file(app_name, model_dir, file_format='feather', per_model=True,
+                                                        **session_filter)
+            assert [os.path.basename(p) for p in paths] == ['%s.feather' % m for m in
+                                                            ('session', 'participant', 'subsession', 'group',
+                                                             'player', 'fruitoffer', 'purchase', 'restock')]
+
+            df_offers = pd.read_feather(os.path.join(model_dir, 'fruitoffer.feather'))
+            assert len(df_offers) == FruitOffer.objects.filter(seller__session=self.session).count()
+            assert str(df_offers['seller_id'].dtype) == 'Int64'
+            assert str(df_offers['price'].dtype) == 'float64'
+
+    def _check_normalized_export(self):
+        # the normalized export has one table per model, linked via ID columns, with one row per model instance
+        app_name = self.player._meta.app_config.name
+        dfs = get_normalized_dataframes_for_app(app_name, session_codes=[self.session.code])
+
+        assert list(dfs.keys()) == ['session', 'participant', 'subsession', 'group', 'player', 'fruitoffer',
+                                    'purchase', 'restock']
+        assert len(dfs['player']) == models.Player.objects.filter(session=self.session).count()
+        assert len(dfs['fruitoffer']) == FruitOffer.objects.filter(seller__session=self.session).count()
+        assert len(dfs['purchase']) == Purchase.objects.filter(buyer__session=self.session).count()
+        assert set(dfs['player']['group_id']) <= set(dfs['group']['id'])
+        assert set(dfs['fruitoffer']['seller_id']) <= set(dfs['player']['id'])
+        assert set(dfs['purchase']['buyer_id']) <= set(dfs['player']['id'])
+        assert set(dfs['restock']['offer_id']) <= set(dfs['fruitoffer']['id'])
+
+        # long format: one row per model instance and field (except for the ID)
+        df_long = get_long_dataframe_from_normalized(dfs)
+        assert list(df_long.columns) == ['model', 'id', 'field', 'value']
+        assert len(df_long) == sum(len(df) * (len(df.columns) - 1) for df in dfs.values())
+
+        long_id_in_group = df_long[(df_long['model'] == 'player') & (df_long['id'] == self.player.id)
+                                   & (df_long['field'] == 'id_in_group')]['value'].tolist()
+        assert long_id_in_group == [self.player.id_in_group]
+
+    def _check_chained_custom_models(self):
+        # restocks are linked to fruit offers, which are in turn linked to players
+        app_name = self.player._meta.app_config.name
+        session_filter = dict(session_codes=[self.session.code])
+        offer_per_restock = dict(Restock.objects.filter(offer__seller__session=self.session)
+                                 .values_list('id', 'offer_id'))
+
+        # hierarchical export: restocks are nested under their offer
+        nested_offer_per_restock = {}
+        for sess in get_hierarchical_data_for_app(app_name, **session_filter):
+            for subsess in sess['__subsession']:
+                for grp in subsess['__group']:
+                    for player in grp['__player']:
+                        for offer in player.get('__fruitoffer', []):
+                            for restock in offer.get('__restock', []):
+                                nested_offer_per_restock[restock['id']] = offer['id']
+
+        assert nested_offer_per_restock == offer_per_restock, 'restocks are not nested under their offers'
+
+        # custom export: restocks are joined with their offer
+        df = get_dataframe_for_custom_export(app_name, **session_filter)
+        df_restocks = df.loc[df['restock.id'].notna(), ['restock.id', 'fruitoffer.id']].astype(int)
+        assert dict(zip(df_restocks['restock.id'], df_restocks['fruitoffer.id'])) == offer_per_restock,\
+            'restocks are not joined with their offers'
+
+    def _check_join_dataframes(self):
+        # joins on indexed dataframes must give the same result as the former chain of merges on columns
+        session = self.session
+
+        def model_dataframe(name, qs, fields):
+            df = pd.DataFrame(list(qs.order_by('id').values_list(*fields)), columns=fields)
+            return df.rename(columns={c: name + '.' + c for c in fields})
+
+        df_player = model_dataframe('player', models.Player.objects.filter(session=session),
+                                    ['id', 'round_number', 'balance'])
+        # each tuple: dataframe, left key, right key; offers, purchases and restocks multiply rows
+        right = [
+            (model_dataframe('fruitoffer', FruitOffer.objects.filter(seller__session=session),
+                             ['id', 'seller_id', 'kind', 'amount']), 'player.id', 'fruitoffer.seller_id'),
+            (model_dataframe('restock', Restock.objects.filter(offer__seller__session=session),
+                             ['id', 'offer_id', 'amount']), 'fruitoffer.id', 'restock.offer_id'),
+            (model_dataframe('purchase', Purchase.objects.filter(buyer__session=session),
+                             ['id', 'buyer_id', 'amount']), 'player.id', 'purchase.buyer_id'),
+        ]
+
+        df_merged = df_player
+        joins = []
+        columns = list(df_player.columns)
+        for df_right, left_key, right_key in right:
+            df_merged = pd.merge(df_merged, df_right, how='left', left_on=left_key, right_on=right_key)
+            del df_merged[right_key]
+
+            df_right_indexed = df_right.drop(columns=right_key)
+            df_right_indexed.index = pd.Index(df_right[right_key].to_numpy())
+            joins.append((left_key, df_right_indexed))
+            columns.extend(df_right_indexed.columns)
+
+        assert join_dataframes(df_player, joins, columns).equals(df_merged),\
+            'joined data differs from merged data'
+
+    def _check_export_deltas(self):
+        # merging a full export and a delta must give the same data as a new full export
+        app_name = self.player._meta.app_config.name
+        session_filter = dict(session_codes=[self.session.code])
+        player = self.player
+        offer = FruitOffer.objects.filter(seller__session=self.session).first()
+
+        if offer:
+            changed_restock = Restock.objects.create(offer=offer, amount=1)
+            deleted_restock = Restock.objects.create(offer=offer, amount=2)
+
+        full, manifest = get_export_delta(app_name, **session_filter)
+
+        # modify, delete and add rows
+        player.balance += 1
+        player.save()
+        if offer:
+            changed_restock.amount += 1
+            changed_restock.save()
+            deleted_restock_id = deleted_restock.pk
+            deleted_restock.delete()
+            new_restock = Restock.objects.create(offer=offer, amount=3)
+
+        delta, _ = get_export_delta(app_name, manifest, **session_filter)
+        assert any(table['rows'] for table in delta.values()), 'changed rows missing in delta'
+        if offer:
+            assert delta['restock']['deleted'] == [deleted_restock_id]
+            assert [row[0] for row in delta['restock']['rows']] == [changed_restock.pk, new_restock.pk]
+
+        expected, _ = get_export_delta(app_name, **session_filter)
+        assert merge_export_deltas([full, delta]) == expected, 'merged deltas differ from full export'
+
+        # restore the previous data
+        player.balance -= 1
+        player.save()
+        if offer:
+            changed_restock.delete()
+            new_restock.delete()
+
+    def _check_data_tab_update(self):
+        # unmodified tables are not sent again and applying a patch to the known rows gives the current rows
+        session = self.session
+        app_name = self.player._meta.app_config.name
+        player = self.player
+
+        for compact in (False, True):
+            table = get_data_tab_update(session, [''], app_name, self.round_number, compact=compact)['tables'][0]
+            known_hash = table['hash']
+            known_rows = _decode_rows_compact(table['rows_compact']) if compact else table['rows']
+
+            assert get_data_tab_update(session, [known_hash], app_name, self.round_number,
+                                       compact=compact)['tables'] == [None], 'unmodified table was sent again'
+
+            player.balance += 1
+            player.save()
+
+            patched = get_data_tab_update(session, [known_hash], app_name, self.round_number,
+                                          compact=compact)['tables'][0]
+            if compact:
+                patch = zip(patched['patch_indices'], _decode_rows_compact(patched['patch_compact']))
+            else:
+                patch = patched['patch']
+            assert patched['hash'] != known_hash
+
+            rows = known_rows[:patched['n_rows']]
+            for i_row, row in patch:
+                if i_row < len(rows):
+                    rows[i_row] = row
+                else:
+                    rows.append(row)
+
+            assert rows == get_data_tab_update(session, [''], app_name, self.round_number)['tables'][0]['rows'],\
+                'patched rows differ from current rows'
+
+            player.balance -= 1
+            player.save()
+
+    def _check_compact_rows_encoding(self):
+        # decoding the compact encoding must give the original rows for each kind of column encoding
+        rows = [['a', str(i // 4), 'xy'[i % 2], str(i)] for i in range(8)]  # constant, runs, distinct, other
+        encoded = encode_rows_compact(rows)
+
+        assert [list(col.keys())[0] for col in encoded['columns']] == ['c', 'r', 'd', 'v']
+        assert _decode_rows_compact(encoded) == rows
+        assert _decode_rows_compact(encode_rows_compact([])) == []
+
+        rows = get_rows_for_data_tab_app(self.session, self.player._meta.app_config.name,
+                                         round_number=self.round_number, expand_custom_models=True)
+        rows = next(rows)
+        assert _decode_rows_compact(encode_rows_compact(rows)) == rows, 'decoded rows differ from original rows'
+
+    def _check_data_tab_ajax_view(self):
+        # the data of the live data view is provided in pages and not sent again if it was not modified
+        session = self.session
+        player = self.player
+        view = SessionDataAjaxExtension.as_view()
+        params = {'v': '2', 'app': player._meta.app_config.name, 'round': self.round_number, 'hashes': '',
+                  'limit': 2000}
+
+        response = view(RequestFactory().get('/', params), code=session.code)
+        assert response.status_code == 200
+        all_rows = json.loads(response.content.decode('utf-8'))['tables'][0]['rows']
+
+        page_params = dict(params, offset=1, limit=2)
+        response = view(RequestFactory().get('/', page_params), code=session.code)
+        page = json.loads(response.content.decode('utf-8'))['tables'][0]
+        assert page['rows'] == all_rows[1:3], 'page of rows differs from the rows of the complete table'
+        assert page['n_rows_total'] == len(all_rows) and page['offset'] == 1
+
+        # revalidation via ETag
+        etag = response['ETag']
+        response = view(RequestFactory().get('/', page_params, HTTP_IF_NONE_MATCH=etag), code=session.code)
+        assert response.status_code == 304, 'unmodified data was sent again'
+
+        player.balance += 1
+        player.save()
+        response = view(RequestFactory().get('/', page_params, HTTP_IF_NONE_MATCH=etag), code=session.code)
+        assert response.status_code == 200, 'modified data was not sent'
+
+        player.balance -= 1
+        player.save()
+
+    def _check_push_modified_tables(self):
+        # several modifications within `PUSH_COALESCE_SECONDS` are pushed to the session data monitors at once
+        session = self.session
+        player = self.player
+        table = [player._meta.app_config.name, self.round_number]
+
+        signals.add_session_data_subscriber(session.code)
+        try:
+            with mock.patch('otree.channels.utils.sync_group_send_wrapper') as group_send:
+                for balance_change in (1, -1):
+                    player.balance += balance_change
+                    player.save()
+
+                time.sleep(3 * signals.PUSH_COALESCE_SECONDS)
+        finally:
+            signals.remove_session_data_subscriber(session.code)
+
+        group_send.assert_called_once_with(type='session_data_modified',
+                                           group=signals.session_data_group_name(session.code),
+                                           event={'tables': [table]})
+
+        # a connected monitor that shows this table receives an update with the modified rows
+        consumer = SessionDataConsumer({'type': 'websocket', 'url_route': {'kwargs': {'code': session.code}}})
+        consumer.table = tuple(table)
+        consumer.table_hash = ''
+        consumer.options = {}
+        sent = []
+
+        async def send_json(content):
+            sent.append(content)
+
+        consumer.send_json = send_json
+        asyncio.get_event_loop().run_until_complete(consumer.session_data_modified({'tables': [table]}))
+        asyncio.get_event_loop().run_until_complete(consumer.session_data_modified({'tables': [['other', 1]]}))
+
+        assert len(sent) == 1, 'update was not pushed exactly once'
+        assert sent[0]['update']['rows'] == get_data_tab_update(session, [''], *table)['tables'][0]['rows']
+        assert consumer.table_hash == sent[0]['update']['hash']
+
+    def _check_sanitize_dataframe(self):
+        # sanitizing per column must give the same values as sanitizing each value with `applymap()`
+        df_edge_cases = pd.DataFrame({
+            'int': [1, -2, 0, 10**12],
+            'float': [0.5, np.nan, -0.0, 1e17],
+            'int_na': [1.0, np.nan, 3.0, -4.0],
+            'inf': [np.inf, -np.inf, 2.5, np.nan],
+            'currency': [c(1.5), c(0), None, c(-2)],
+            'str': ['Apple', None, '<b>', 'Apple'],
+            'bool': [True, False, False, True],
+            'bool_na': pd.Series([True, np.nan, False, np.nan], dtype=object),
+            'time': pd.to_datetime([1600000000, 1600000001, None, 1600000002], unit='s', utc=True),
+        })
+        df_export = get_dataframe_for_custom_export(self.player._meta.app_config.name,
+                                                    session_codes=[self.session.code])
+
+        for df in (df_edge_cases, df_export):
+            for sanitize_value, sanitize_df in ((sanitize_pdvalue_for_live_update, sanitize_dataframe_for_live_update),
+                                                (sanitize_pdvalue_for_csv, sanitize_dataframe_for_csv)):
+                assert sanitize_df(df).equals(df.applymap(sanitize_value)),\
+                    '%s differs from applymap()' % sanitize_df.__name__
+
+    def _check_custom_export_roles(self):
+        # roles in the custom export must be determined via the overridden `Player.role()` method
+        df = get_dataframe_for_custom_export(self.player._meta.app_config.name)
+
+        expected_roles = ['buyer' if id_in_group == 1 else 'seller' for id_in_group in df['player.id_in_group']]
+        assert df['player.role'].tolist() == expected_roles, 'player roles in custom export are wrong'
+
     def play_round(self):
         if self.player.role() == 'buyer':
             offers_input = None
@@ -199,3 +745,28 @@ class PlayerBot(Bot):
         yield Submission(pages.Results)
 
         self._check_balance(offers_properties, purchases_properties)
+
+        if self.round_number == Constants.num_rounds and self.player.role() == 'buyer':
+            self._check_export_query_budget()
+            self._check_export_participant_vars_options()
+            self._check_custom_export_roles()
+            self._check_data_tab_query_budget()
+            self._check_shared_data_tab_rows()
+            self._check_bounded_local_cache()
+            self._check_data_tab_aggregation()
+            self._check_session_aggregates()
+            self._check_json_stream_export()
+            self._check_export_session_filters()
+            self._check_chunked_export()
+            self._check_parallel_export()
+            self._check_columnar_export()
+            self._check_normalized_export()
+            self._check_chained_custom_models()
+            self._check_join_dataframes()
+            self._check_export_deltas()
+            self._check_data_tab_update()
+            self._check_compact_rows_encoding()
+            self._check_data_tab_ajax_view()
+            self._check_push_modified_tables()
+            self._check_sanitize_dataframe()
+            self._check_data_fingerprint()
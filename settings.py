@@ -90,3 +90,4 @@ INSTALLED_APPS = [
 
 if importlib.util.find_spec('pandas'):
     ROOT_URLCONF = 'otreeutils_example3_market.urls'
+    EXTENSION_APPS = ['otreeutils']   # push updates to the session data monitor via WebSockets
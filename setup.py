@@ -19,6 +19,7 @@ DEPS_BASE = ['otree>=3.3,<4']
 
 DEPS_EXTRA = {
     'admin': ['pandas>=1.0,<1.3'],
+    'columnar': ['pandas>=1.0,<1.3', 'pyarrow>=1.0'],
     'develop': ['tox>=3.21.0,<3.22', 'twine>=3.1.0,<3.2']
 }
 